@@ -10,6 +10,14 @@ class ContactMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='contact_recent_idx'),
+            # Unread messages (Django renders is_read=False as NOT is_read,
+            # which only a partial index matches)
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_read=False), name='contact_unread_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.email}"
@@ -5,4 +5,15 @@ class ContentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.content'
 
+    def ready(self):
+        from apps.search.index import register_search
+        from core.images import register_image_fields
+        from .models import DojoLocation, Gallery, Instructor, KarateAdventure
 
+        register_image_fields(DojoLocation, 'cover_image', cache_tag='dojo_locations')
+        register_image_fields(Gallery, 'image', cache_tag='gallery')
+        register_image_fields(Instructor, 'photo', cache_tag='instructors')
+        register_image_fields(KarateAdventure, 'cover_image', cache_tag='karate_adventures')
+        register_search(DojoLocation, 'name', 'description', 'address', 'city', 'country')
+        register_search(Instructor, 'name', 'rank', 'bio')
+        register_search(KarateAdventure, 'title', 'description', 'location')
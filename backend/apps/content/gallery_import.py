@@ -0,0 +1,82 @@
+"""
+Bulk creation of gallery items
+
+Shared by the bulkCreateGalleryItems mutation and the import_gallery
+management command. Images are validated and stored one by one so a bad
+file only fails its own item; the rows for every good item are then
+written with a single bulk_create.
+"""
+import os
+
+from django.core.files import File
+from PIL import Image
+
+from apps.jobs.queue import enqueue_many
+from apps.uploads.references import add_references
+from core.images import generate_derivatives, image_metadata, open_image, process_image_upload, without_metadata
+
+from .models import Gallery
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif'}
+
+
+def title_from_filename(filename):
+    return os.path.splitext(os.path.basename(filename))[0].replace('_', ' ').replace('-', ' ').strip()
+
+
+def store_gallery_image(f, filename):
+    """
+    Check that ``f`` is a readable image and save it, without metadata,
+    where Gallery.image stores uploads; returns the storage name. Raises
+    ValueError otherwise.
+    """
+    try:
+        Image.open(f).verify()
+        f.seek(0)
+        # Stripped before it is stored, so no copy with metadata is left behind
+        content = without_metadata(Image.open(f))
+    except Exception:
+        raise ValueError(f"{filename} is not a valid image")
+    f.seek(0)
+    field = Gallery._meta.get_field('image')
+    return field.storage.save(field.generate_filename(None, os.path.basename(filename)), content or File(f))
+
+
+def import_image_file(path):
+    """
+    Process pool task for import_gallery: store the image at ``path``,
+    render its derivatives and compute its metadata. Returns
+    ``(path, name, metadata, error)``.
+    """
+    try:
+        with open(path, 'rb') as f:
+            name = store_gallery_image(f, path)
+        fieldfile = Gallery(image=name).image
+        generate_derivatives(fieldfile)
+        metadata = image_metadata(open_image(fieldfile))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return path, None, None, str(e)
+    return path, name, metadata, None
+
+
+def create_gallery_items(items, process_images=True):
+    """
+    Insert Gallery rows for ``items`` (dicts of title, image and optionally
+    description and image_metadata) in one query and return them. With ``process_images`` their
+    derivatives are queued for the background workers. bulk_create sends
+    no post_save signals, so the usual upload hook does not fire and the
+    file references are added here.
+    """
+    created = Gallery.objects.bulk_create([
+        Gallery(
+            title=item['title'],
+            image=item['image'],
+            description=item.get('description') or "",
+            image_metadata=item.get('image_metadata'),
+        )
+        for item in items
+    ])
+    add_references(obj.image.name for obj in created)
+    if process_images and created:
+        enqueue_many(process_image_upload, [(Gallery._meta.label, obj.pk, 'image') for obj in created])
+    return created
@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core.images import process_image
+from core.response_cache import invalidate_tags
+
+
+class Command(BaseCommand):
+    help = "Generate responsive image derivatives and metadata for existing uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--overwrite', action='store_true',
+            help="Regenerate derivatives and metadata that already exist",
+        )
+
+    def handle(self, *args, overwrite=False, **options):
+        total = 0
+        for model in apps.get_models():
+            field_names = getattr(model, '_image_derivative_fields', ())
+            for field_name in field_names:
+                queryset = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                for obj in queryset.only('pk', field_name, f'{field_name}_metadata').iterator():
+                    try:
+                        created = process_image(obj, field_name, overwrite=overwrite)
+                    except (OSError, ValueError) as e:
+                        self.stderr.write(f"{model._meta.label} {obj.pk} {getattr(obj, field_name).name}: {e}")
+                        continue
+                    total += len(created)
+            if field_names and model._image_cache_tag:
+                invalidate_tags(model._image_cache_tag)
+        self.stdout.write(self.style.SUCCESS(f"Generated {total} derivatives"))
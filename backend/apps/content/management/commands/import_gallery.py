@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.content.gallery_import import IMAGE_EXTENSIONS, create_gallery_items, import_image_file, title_from_filename
+from apps.jobs import worker
+from core.response_cache import invalidate_tags
+
+
+class Command(BaseCommand):
+    help = "Import every image in a directory as a gallery item"
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help="Number of processes decoding images and rendering derivatives",
+        )
+        parser.add_argument('--recursive', action='store_true', help="Include subdirectories")
+        parser.add_argument('--description', default="", help="Description for every imported item")
+
+    def find_images(self, directory, recursive):
+        for root, dirs, files in os.walk(directory):
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.join(root, filename)
+            if not recursive:
+                break
+            dirs.sort()
+
+    def handle(self, *args, directory, processes, recursive, description, **options):
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+        paths = list(self.find_images(directory, recursive))
+        if not paths:
+            self.stdout.write("No images found")
+            return
+
+        # Workers open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        items = []
+        failed = 0
+        with ProcessPoolExecutor(processes, mp_context=context, initializer=worker.init_process) as pool:
+            for path, name, metadata, error in pool.map(import_image_file, paths, chunksize=4):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{path}: {error}")
+                else:
+                    items.append({
+                        'title': title_from_filename(path),
+                        'image': name,
+                        'description': description,
+                        'image_metadata': metadata,
+                    })
+
+        # Derivatives and metadata were computed by the pool, so nothing is queued
+        created = create_gallery_items(items, process_images=False)
+        if created:
+            invalidate_tags('gallery')
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(created)} images ({failed} failed)"))
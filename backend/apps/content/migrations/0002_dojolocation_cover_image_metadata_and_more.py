@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dojolocation',
+            name='cover_image_metadata',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gallery',
+            name='image_metadata',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='instructor',
+            name='photo_metadata',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='karateadventure',
+            name='cover_image_metadata',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
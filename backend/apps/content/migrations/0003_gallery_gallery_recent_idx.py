@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_dojolocation_cover_image_metadata_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gallery',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='gallery_recent_idx'),
+        ),
+    ]
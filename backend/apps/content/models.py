@@ -9,6 +9,7 @@ class DojoLocation(models.Model):
     map_link = models.URLField(blank=True, null=True)
     description = models.TextField(blank=True)
     cover_image = models.ImageField(upload_to='dojo_locations/', blank=True, null=True)
+    cover_image_metadata = models.JSONField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -19,9 +20,15 @@ class DojoLocation(models.Model):
 class Gallery(models.Model):
     title = models.CharField(max_length=255)
     image = models.ImageField(upload_to='gallery/')
+    image_metadata = models.JSONField(null=True, blank=True, editable=False)
     description = models.TextField(blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-uploaded_at', '-id'], name='gallery_recent_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -31,6 +38,7 @@ class Instructor(models.Model):
     rank = models.CharField(max_length=100)
     bio = models.TextField(blank=True)
     photo = models.ImageField(upload_to='instructors/', blank=True, null=True)
+    photo_metadata = models.JSONField(null=True, blank=True, editable=False)
     dojo_location = models.ForeignKey(DojoLocation, on_delete=models.CASCADE, related_name='instructors')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,6 +54,7 @@ class KarateAdventure(models.Model):
     end_date = models.DateTimeField()
     location = models.CharField(max_length=255)
     cover_image = models.ImageField(upload_to='adventures/', blank=True, null=True)
+    cover_image_metadata = models.JSONField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -1,21 +1,27 @@
 from django.contrib import admin
 from .models import Event, EventRegistration
+from .registration import promote_waitlist
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'date', 'location', 'fee', 'current_registrations', 'max_participants', 'is_published')
+    list_display = ('title', 'date', 'location', 'fee', 'current_registrations', 'max_participants', 'waitlist_count', 'is_published')
     list_filter = ('is_published', 'date', 'location')
     search_fields = ('title', 'description', 'location')
     ordering = ('-date',)
-    readonly_fields = ('created_at', 'updated_at', 'current_registrations')
+    readonly_fields = ('created_at', 'updated_at', 'current_registrations', 'waitlist_count')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'max_participants' in form.changed_data:
+            promote_waitlist(obj.pk)
 
 
 @admin.register(EventRegistration)
 class EventRegistrationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'event', 'status', 'created_at')
+    list_display = ('user', 'event', 'status', 'waitlist_position', 'created_at')
     list_filter = ('status', 'created_at', 'event')
     search_fields = ('user__email', 'user__username', 'event__title')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'waitlist_position')
 
@@ -5,3 +5,13 @@ class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.events'
 
+    def ready(self):
+        from django.db.models.signals import post_delete
+        from apps.search.index import register_search
+        from core.images import register_image_fields
+        from .models import Event, EventRegistration
+        from .registration import registration_deleted
+
+        register_image_fields(Event, 'cover_image', cache_tag='events')
+        register_search(Event, 'title', 'description', 'location', filter={'is_published': True})
+        post_delete.connect(registration_deleted, sender=EventRegistration, dispatch_uid='events.registration_deleted')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='cover_image_metadata',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_waitlist_count_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-date', '-id'], name='event_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['user', '-created_at'], name='registration_user_idx'),
+        ),
+    ]
@@ -10,24 +10,43 @@ class Event(models.Model):
     date = models.DateTimeField()
     location = models.CharField(max_length=200)
     cover_image = models.ImageField(upload_to='events/', blank=True, null=True)
+    cover_image_metadata = models.JSONField(null=True, blank=True, editable=False)
     fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     max_participants = models.PositiveIntegerField(null=True, blank=True)
     current_registrations = models.PositiveIntegerField(default=0)
+    waitlist_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
 
+    # Maintained with conditional updates by apps.events.registration
+    COUNTER_FIELDS = ('current_registrations', 'waitlist_count')
+
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Published list and its keyset pages
+            models.Index(fields=['-date', '-id'], condition=models.Q(is_published=True), name='event_published_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Never write back counters that may be stale in memory
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class EventRegistration(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
+        ('waitlisted', 'Waitlisted'),
         ('cancelled', 'Cancelled'),
     ]
 
@@ -35,12 +54,18 @@ class EventRegistration(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_registrations')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     additional_notes = models.TextField(blank=True)
+    # 1-based place in the event's waitlist while status is waitlisted
+    waitlist_position = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['event', 'user']
         ordering = ['-created_at']
+        indexes = [
+            # A user's registrations, newest first
+            models.Index(fields=['user', '-created_at'], name='registration_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.event.title}"
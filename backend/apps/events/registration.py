@@ -0,0 +1,186 @@
+"""
+Event registration and waitlists
+
+A seat is claimed with a single conditional UPDATE that only increments
+``current_registrations`` while the event has room, so concurrent signups
+can never push it past ``max_participants``: the database serializes the
+updates and re-checks the condition for each one. The registration row is
+inserted in the same transaction, and the unique (event, user) constraint
+rejects duplicates, which rolls the seat back.
+
+When the event is full, entrants join its waitlist with the next
+``waitlist_position``. Positions are kept dense (1..waitlist_count), so
+when seats free up the first N entrants are promoted, and everyone behind
+them moves up, with one UPDATE each however long the waitlist is.
+Deleted registrations (e.g. with their user) release their seat or
+position through ``registration_deleted``.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.response_cache import invalidate_tags
+
+from .models import Event, EventRegistration
+
+# Events without a limit (null or 0, as the admin allows either)
+UNLIMITED = Q(max_participants__isnull=True) | Q(max_participants=0)
+HAS_ROOM = UNLIMITED | Q(current_registrations__lt=F('max_participants'))
+
+# Statuses holding a seat
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+CANCEL_ATTEMPTS = 5
+
+
+class RegistrationError(Exception):
+    pass
+
+
+def register(event_id, user, additional_notes='', join_waitlist=True):
+    """
+    Register ``user`` for the event and return the registration, which is
+    waitlisted if the event is full and ``join_waitlist`` is set
+    """
+    # Checked up front for a clear message; the unique constraint is what
+    # actually prevents duplicates
+    if EventRegistration.objects.filter(event_id=event_id, user=user).exclude(status='cancelled').exists():
+        raise RegistrationError("Already registered for this event")
+
+    try:
+        with transaction.atomic():
+            # The write comes first so SQLite takes its write lock (waiting
+            # on busy_timeout) instead of failing to upgrade a read lock
+            claimed = Event.objects.filter(HAS_ROOM, pk=event_id).update(
+                current_registrations=F('current_registrations') + 1
+            )
+            if claimed:
+                return _save_registration(event_id, user, additional_notes=additional_notes, status='pending')
+
+            if not join_waitlist:
+                if not Event.objects.filter(pk=event_id).exists():
+                    raise RegistrationError("Event not found")
+                raise RegistrationError("Event is full")
+            if not Event.objects.filter(pk=event_id).update(waitlist_count=F('waitlist_count') + 1):
+                raise RegistrationError("Event not found")
+            # The update above holds the event's row lock, so the count is ours
+            position = Event.objects.filter(pk=event_id).values_list('waitlist_count', flat=True).get()
+            registration = _save_registration(
+                event_id, user, additional_notes=additional_notes, status='waitlisted', waitlist_position=position,
+            )
+            # A seat may have been freed since the update failed
+            if promote_waitlist(event_id):
+                registration.refresh_from_db(fields=['status', 'waitlist_position'])
+            return registration
+    except IntegrityError:
+        raise RegistrationError("Already registered for this event")
+
+
+def _save_registration(event_id, user, **fields):
+    # A cancelled registration is reused, as (event, user) is unique
+    reused = EventRegistration.objects.filter(event_id=event_id, user=user, status='cancelled').update(
+        updated_at=timezone.now(), **fields
+    )
+    if reused:
+        return EventRegistration.objects.get(event_id=event_id, user=user)
+    return EventRegistration.objects.create(event_id=event_id, user=user, **fields)
+
+
+def cancel(event_id, user):
+    """Cancel ``user``'s registration, handing a freed seat to the waitlist"""
+    for _ in range(CANCEL_ATTEMPTS):
+        registration = EventRegistration.objects.filter(
+            event_id=event_id, user=user
+        ).exclude(status='cancelled').first()
+        if registration is None:
+            raise RegistrationError("Not registered for this event")
+
+        waitlisted = registration.status == 'waitlisted'
+        counter = 'waitlist_count' if waitlisted else 'current_registrations'
+        with transaction.atomic():
+            # The event row is written first, locking it before any
+            # registration rows as register and promote_waitlist do (on
+            # SQLite this takes the write lock for the transaction)
+            Event.objects.filter(pk=event_id, **{f'{counter}__gt': 0}).update(**{counter: F(counter) - 1})
+            # Registrations only change under that lock, so this is stable
+            registration = EventRegistration.objects.filter(pk=registration.pk).first()
+            if registration is None or registration.status == 'cancelled':
+                raise RegistrationError("Not registered for this event")
+            if (registration.status == 'waitlisted') != waitlisted:
+                # Promoted meanwhile: the other counter has to be released
+                transaction.set_rollback(True)
+                continue
+
+            position = registration.waitlist_position
+            registration.status = 'cancelled'
+            registration.waitlist_position = None
+            registration.save(update_fields=['status', 'waitlist_position', 'updated_at'])
+            if waitlisted:
+                EventRegistration.objects.filter(
+                    event_id=event_id, status='waitlisted', waitlist_position__gt=position
+                ).update(waitlist_position=F('waitlist_position') - 1)
+            else:
+                promote_waitlist(event_id)
+        return registration
+    raise RegistrationError("Registration changed concurrently, please try again")
+
+
+def promote_waitlist(event_id):
+    """
+    Move waitlisted entrants into the event's free seats in FIFO order and
+    return how many were promoted
+    """
+    with transaction.atomic():
+        event = Event.objects.select_for_update().filter(pk=event_id).values(
+            'max_participants', 'current_registrations', 'waitlist_count'
+        ).first()
+        if event is None or not event['waitlist_count']:
+            return 0
+        if event['max_participants']:
+            free = min(event['max_participants'] - event['current_registrations'], event['waitlist_count'])
+        else:
+            free = event['waitlist_count']
+        if free <= 0:
+            return 0
+
+        # The first entrants by position, so a gap in the numbering (rows
+        # removed behind our back) cannot leave anyone stuck
+        first = EventRegistration.objects.filter(
+            event_id=event_id, status='waitlisted'
+        ).order_by('waitlist_position').values_list('pk', flat=True)[:free]
+        promoted = EventRegistration.objects.filter(pk__in=list(first)).update(
+            status='pending', waitlist_position=None, updated_at=timezone.now()
+        )
+        EventRegistration.objects.filter(event_id=event_id, status='waitlisted').update(
+            waitlist_position=F('waitlist_position') - promoted
+        )
+        Event.objects.filter(pk=event_id).update(
+            current_registrations=F('current_registrations') + promoted,
+            waitlist_count=F('waitlist_count') - promoted,
+        )
+    return promoted
+
+
+def registration_deleted(sender, instance, **kwargs):
+    """
+    post_delete receiver releasing the seat or waitlist position of a
+    deleted registration, so the counters and positions stay consistent.
+    Cached event responses show the counts, so they are invalidated once
+    the deletion commits.
+    """
+    if instance.status == 'cancelled':
+        return
+    transaction.on_commit(lambda: invalidate_tags('events'))
+    event_id = instance.event_id
+    with transaction.atomic():
+        if instance.status == 'waitlisted':
+            Event.objects.filter(pk=event_id, waitlist_count__gt=0).update(waitlist_count=F('waitlist_count') - 1)
+            if instance.waitlist_position is not None:
+                EventRegistration.objects.filter(
+                    event_id=event_id, status='waitlisted', waitlist_position__gt=instance.waitlist_position
+                ).update(waitlist_position=F('waitlist_position') - 1)
+        else:
+            Event.objects.filter(pk=event_id, current_registrations__gt=0).update(
+                current_registrations=F('current_registrations') - 1
+            )
+            promote_waitlist(event_id)
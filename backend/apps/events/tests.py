@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from apps.users.models import User
+from core.response_cache import get_cache_key
+
+from .models import Event, EventRegistration
+from .registration import RegistrationError, promote_waitlist, register
+
+
+def create_users(count, prefix='member'):
+    return [
+        User.objects.create_user(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com')
+        for i in range(count)
+    ]
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.event = Event.objects.create(
+            title='Grading', description='', date=timezone.now(), location='Dojo', max_participants=2,
+        )
+        self.users = create_users(5)
+        for user in self.users:
+            register(self.event.pk, user)
+
+    def assertConsistent(self):
+        self.event.refresh_from_db()
+        registrations = EventRegistration.objects.filter(event=self.event)
+        active = registrations.filter(status__in=['pending', 'confirmed']).count()
+        positions = list(
+            registrations.filter(status='waitlisted').order_by('waitlist_position').values_list('waitlist_position', flat=True)
+        )
+        self.assertEqual(self.event.current_registrations, active)
+        self.assertLessEqual(active, self.event.max_participants)
+        self.assertEqual(self.event.waitlist_count, len(positions))
+        self.assertEqual(positions, list(range(1, len(positions) + 1)))
+
+    def status(self, user):
+        registration = EventRegistration.objects.get(event=self.event, user=user)
+        return registration.status, registration.waitlist_position
+
+    def test_deleting_user_with_seat_promotes_waitlist(self):
+        self.users[0].delete()
+        self.assertEqual(self.status(self.users[2]), ('pending', None))
+        self.assertEqual(self.status(self.users[3]), ('waitlisted', 1))
+        self.assertConsistent()
+
+    def test_deleting_waitlisted_registration_closes_gap(self):
+        EventRegistration.objects.get(event=self.event, user=self.users[3]).delete()
+        self.assertEqual(self.status(self.users[2]), ('waitlisted', 1))
+        self.assertEqual(self.status(self.users[4]), ('waitlisted', 2))
+        self.assertConsistent()
+
+    def test_queryset_delete_releases_counters(self):
+        EventRegistration.objects.filter(event=self.event, user__in=self.users[:2]).delete()
+        self.assertEqual(self.status(self.users[2]), ('pending', None))
+        self.assertEqual(self.status(self.users[3]), ('pending', None))
+        self.assertEqual(self.status(self.users[4]), ('waitlisted', 1))
+        self.assertConsistent()
+
+    def test_deletion_invalidates_cached_events(self):
+        def cache_key():
+            return get_cache_key('{events{currentRegistrations}}', None, None, 'anonymous', {'events'})
+
+        before = cache_key()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[0].delete()
+        self.assertNotEqual(cache_key(), before)
+
+    def test_promotion_ignores_gaps_in_positions(self):
+        # Positions 1..3 renumbered to 2, 4, 6, bypassing signals
+        EventRegistration.objects.filter(event=self.event, status='waitlisted').update(
+            waitlist_position=2 * F('waitlist_position')
+        )
+        Event.objects.filter(pk=self.event.pk).update(max_participants=4)
+        self.assertEqual(promote_waitlist(self.event.pk), 2)
+        self.assertEqual(self.status(self.users[2]), ('pending', None))
+        self.assertEqual(self.status(self.users[3]), ('pending', None))
+        self.assertEqual(self.status(self.users[4])[0], 'waitlisted')
+
+
+class ConcurrentRegistrationTests(TransactionTestCase):
+    """Parallel signups for one capped event, each on its own connection"""
+    capacity = 5
+    entrants = 300
+    workers = 16
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            title='Seminar', description='', date=timezone.now(), location='Dojo', max_participants=self.capacity,
+        )
+        self.users = create_users(self.entrants, prefix='entrant')
+
+    def register_all(self, **kwargs):
+        barrier = Barrier(self.workers)
+
+        def run(users):
+            barrier.wait()
+            outcomes = []
+            try:
+                for user in users:
+                    try:
+                        outcomes.append(register(self.event.pk, user, **kwargs).status)
+                    except RegistrationError as e:
+                        outcomes.append(str(e))
+            finally:
+                connection.close()
+            return outcomes
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            batches = pool.map(run, [self.users[i::self.workers] for i in range(self.workers)])
+            return [outcome for batch in batches for outcome in batch]
+
+    def test_capacity_is_never_exceeded(self):
+        outcomes = self.register_all(join_waitlist=False)
+
+        self.event.refresh_from_db()
+        self.assertEqual(outcomes.count('pending'), self.capacity)
+        self.assertEqual(outcomes.count('Event is full'), self.entrants - self.capacity)
+        self.assertEqual(EventRegistration.objects.filter(event=self.event).count(), self.capacity)
+        self.assertEqual(self.event.current_registrations, self.capacity)
+
+    def test_overflow_joins_waitlist_in_order(self):
+        outcomes = self.register_all()
+
+        self.event.refresh_from_db()
+        waitlisted = self.entrants - self.capacity
+        self.assertEqual(outcomes.count('pending'), self.capacity)
+        self.assertEqual(outcomes.count('waitlisted'), waitlisted)
+        self.assertEqual(self.event.current_registrations, self.capacity)
+        self.assertEqual(self.event.waitlist_count, waitlisted)
+        positions = EventRegistration.objects.filter(event=self.event, status='waitlisted').order_by(
+            'waitlist_position'
+        ).values_list('waitlist_position', flat=True)
+        self.assertEqual(list(positions), list(range(1, waitlisted + 1)))
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'max_attempts', 'run_at', 'updated_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'last_error')
+    ordering = ('-created_at',)
+    readonly_fields = ('attempts', 'locked_at', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description="Retry selected jobs now")
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status='running').update(
+            status='pending', attempts=0, run_at=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f"{updated} job(s) queued for retry.")
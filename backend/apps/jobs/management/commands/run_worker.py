@@ -0,0 +1,59 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.jobs import worker
+from apps.jobs.queue import JOB_SETTINGS, claim_due, release_stale
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs in a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=JOB_SETTINGS.get('PROCESSES', 2),
+            help="Number of worker processes",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=JOB_SETTINGS.get('POLL_INTERVAL', 1.0),
+            help="Seconds to wait between checks for due jobs",
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Exit once no jobs are due",
+        )
+
+    def handle(self, *args, processes, poll_interval, burst, **options):
+        # Workers open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        running = {}
+        with ProcessPoolExecutor(processes, mp_context=context, initializer=worker.init_process) as pool:
+            self.stdout.write(f"Worker started with {processes} processes")
+            try:
+                while True:
+                    release_stale()
+                    for job_id in claim_due(processes - len(running)):
+                        running[pool.submit(worker.run, job_id)] = job_id
+
+                    if not running:
+                        if burst:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        try:
+                            status = future.result()
+                        except Exception as e:
+                            # The pool itself failed; release_stale() requeues the job later
+                            self.stderr.write(f"Job {job_id} crashed: {e}")
+                        else:
+                            self.stdout.write(f"Job {job_id} {status}")
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping worker")
@@ -0,0 +1,105 @@
+"""
+Database-backed job queue
+
+``enqueue`` stores a call to an importable function as a Job row; the
+``run_worker`` management command claims due jobs and runs them in a
+process pool. Failed jobs are retried with exponential backoff until
+``max_attempts`` is reached.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+JOB_SETTINGS = getattr(settings, 'JOB_QUEUE', {})
+
+
+def task_path(task):
+    if isinstance(task, str):
+        return task
+    return f'{task.__module__}.{task.__qualname__}'
+
+
+def enqueue(task, *args, **kwargs):
+    """
+    Queue ``task(*args, **kwargs)``. Arguments must be JSON-serializable.
+
+    With ``JOB_QUEUE['EAGER']`` the job runs in-process once the current
+    transaction commits instead of waiting for a worker.
+    """
+    job = Job.objects.create(
+        task=task_path(task),
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=JOB_SETTINGS.get('MAX_ATTEMPTS', 5),
+    )
+    if JOB_SETTINGS.get('EAGER', False):
+        transaction.on_commit(lambda: claim(job.pk) and run_job(job.pk))
+    return job
+
+
+def enqueue_many(task, args_list):
+    """Queue ``task(*args)`` for every tuple in ``args_list`` with one INSERT"""
+    jobs = Job.objects.bulk_create([
+        Job(task=task_path(task), args=list(args), max_attempts=JOB_SETTINGS.get('MAX_ATTEMPTS', 5))
+        for args in args_list
+    ])
+    if JOB_SETTINGS.get('EAGER', False):
+        transaction.on_commit(lambda: [claim(job.pk) and run_job(job.pk) for job in jobs])
+    return jobs
+
+
+def claim(job_id):
+    """Mark a pending job as running; False if another worker got it first"""
+    return Job.objects.filter(pk=job_id, status='pending').update(
+        status='running',
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    ) == 1
+
+
+def claim_due(limit):
+    """Claim up to ``limit`` jobs that are due and return their ids"""
+    candidates = Job.objects.filter(
+        status='pending', run_at__lte=timezone.now()
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+    return [job_id for job_id in candidates if claim(job_id)]
+
+
+def release_stale():
+    """Requeue running jobs whose worker died without finishing them"""
+    timeout = timedelta(seconds=JOB_SETTINGS.get('LOCK_TIMEOUT', 600))
+    return Job.objects.filter(
+        status='running', locked_at__lt=timezone.now() - timeout
+    ).update(status='pending', locked_at=None)
+
+
+def retry_delay(attempts):
+    base = JOB_SETTINGS.get('RETRY_BACKOFF', 10)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def run_job(job_id):
+    """Run a claimed job and record the outcome; returns the final status"""
+    job = Job.objects.get(pk=job_id)
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+    else:
+        job.status = 'done'
+        job.last_error = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_at', 'locked_at', 'last_error', 'updated_at'])
+    return job.status
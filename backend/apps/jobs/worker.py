@@ -0,0 +1,22 @@
+"""
+Entry points for worker processes
+
+Kept free of model imports so that spawned processes can import this
+module before Django is set up.
+"""
+import django
+
+
+def init_process():
+    django.setup()
+
+
+def run(job_id):
+    from django.db import close_old_connections
+
+    from .queue import run_job
+
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
@@ -5,3 +5,10 @@ class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.news'
 
+    def ready(self):
+        from apps.search.index import register_search
+        from core.images import register_image_fields
+        from .models import News
+
+        register_image_fields(News, 'cover_image', cache_tag='news')
+        register_search(News, 'title', 'content', filter={'is_published': True})
@@ -8,6 +8,7 @@ class News(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     cover_image = models.ImageField(upload_to='news/', blank=True, null=True)
+    cover_image_metadata = models.JSONField(null=True, blank=True, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='news_articles')
     published_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -16,6 +17,12 @@ class News(models.Model):
     class Meta:
         ordering = ['-published_at']
         verbose_name_plural = 'News'
+        indexes = [
+            # Published list and its keyset pages
+            models.Index(
+                fields=['-published_at', '-id'], condition=models.Q(is_published=True), name='news_published_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
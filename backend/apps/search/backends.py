@@ -0,0 +1,142 @@
+"""
+Database-specific full-text index behind apps.search
+
+SQLite indexes SearchDocument's title and body in an external-content FTS5
+table kept in step by triggers, ranks matches with bm25 and marks them up
+with highlight()/snippet(). PostgreSQL stores a weighted tsvector as a
+generated column with a GIN index, ranks with ts_rank_cd and marks up with
+ts_headline, which is only run for the rows of the requested page.
+
+Matches are wrapped in HIGHLIGHT_START/HIGHLIGHT_END, control characters
+that are stripped from indexed text, so the caller can escape the text
+before turning them into markup.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+DOCUMENT_TABLE = 'search_searchdocument'
+FTS_TABLE = 'search_searchdocument_fts'
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+# Length of body snippets, in tokens (words on PostgreSQL)
+SNIPPET_TOKENS = 24
+
+# Title matches count this many times as much as body matches
+TITLE_WEIGHT = 10.0
+
+
+class SQLiteBackend:
+    create_sql = [
+        f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            title, body, content='{DOCUMENT_TABLE}', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )""",
+        f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+        END""",
+        f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        END""",
+        f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON {DOCUMENT_TABLE}
+        WHEN old.title IS NOT new.title OR old.body IS NOT new.body BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+            INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+        END""",
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ]
+    drop_sql = [
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+        f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    ]
+    optimize_sql = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+
+    @staticmethod
+    def match_expression(terms):
+        # Every term quoted (so none is read as an operator), the last one
+        # as a prefix for search-as-you-type
+        return ' '.join(f'"{term}"' for term in terms) + '*'
+
+    def search(self, cursor, terms, content_types, limit, offset):
+        placeholders = ', '.join(['%s'] * len(content_types))
+        cursor.execute(
+            f"""
+            SELECT d.content_type, d.object_id, -bm25({FTS_TABLE}, %s, 1.0) AS score,
+                   highlight({FTS_TABLE}, 0, %s, %s),
+                   snippet({FTS_TABLE}, 1, %s, %s, '…', %s)
+            FROM {FTS_TABLE} JOIN {DOCUMENT_TABLE} d ON d.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND d.content_type IN ({placeholders})
+            ORDER BY score DESC, d.id
+            LIMIT %s OFFSET %s
+            """,
+            [
+                TITLE_WEIGHT, HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS,
+                self.match_expression(terms), *content_types, limit, offset,
+            ],
+        )
+        return cursor.fetchall()
+
+
+class PostgreSQLBackend:
+    config = 'english'
+    create_sql = [
+        f"""ALTER TABLE {DOCUMENT_TABLE} ADD COLUMN document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('{config}', title), 'A') || setweight(to_tsvector('{config}', body), 'B')
+        ) STORED""",
+        f"CREATE INDEX {DOCUMENT_TABLE}_document_idx ON {DOCUMENT_TABLE} USING GIN (document)",
+    ]
+    drop_sql = [
+        f"DROP INDEX IF EXISTS {DOCUMENT_TABLE}_document_idx",
+        f"ALTER TABLE {DOCUMENT_TABLE} DROP COLUMN IF EXISTS document",
+    ]
+    optimize_sql = f"ANALYZE {DOCUMENT_TABLE}"
+
+    @staticmethod
+    def match_expression(terms):
+        return ' & '.join(f"'{term}'" for term in terms) + ':*'
+
+    def search(self, cursor, terms, content_types, limit, offset):
+        title_options = f'HighlightAll=true, StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_END}"'
+        body_options = (
+            f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_END}", '
+            f'MaxWords={SNIPPET_TOKENS}, MinWords={SNIPPET_TOKENS // 2}, MaxFragments=1, FragmentDelimiter="…"'
+        )
+        # Weights for D, C, B (body) and A (title)
+        weights = f'{{0, 0, {1 / TITLE_WEIGHT}, 1}}'
+        cursor.execute(
+            f"""
+            WITH query AS (SELECT to_tsquery(%s::regconfig, %s) AS q),
+            page AS (
+                SELECT d.id, ts_rank_cd(%s::float4[], d.document, query.q) AS score
+                FROM {DOCUMENT_TABLE} d, query
+                WHERE d.document @@ query.q AND d.content_type = ANY(%s)
+                ORDER BY score DESC, d.id
+                LIMIT %s OFFSET %s
+            )
+            SELECT d.content_type, d.object_id, page.score,
+                   ts_headline(%s::regconfig, d.title, query.q, %s),
+                   ts_headline(%s::regconfig, d.body, query.q, %s)
+            FROM page JOIN {DOCUMENT_TABLE} d ON d.id = page.id, query
+            ORDER BY page.score DESC, d.id
+            """,
+            [
+                self.config, self.match_expression(terms), weights, list(content_types), limit, offset,
+                self.config, title_options, self.config, body_options,
+            ],
+        )
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgreSQLBackend,
+}
+
+
+def get_backend(connection):
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(f"Full-text search is not supported on {connection.vendor}")
@@ -0,0 +1,165 @@
+"""
+Full-text search across registered models
+
+``register_search`` names the fields of a model that are searched. Every
+save or delete of one of its rows updates its SearchDocument in the same
+transaction, and the database's full-text index (apps.search.backends)
+follows the document table. Writes that bypass signals (``update()``,
+``bulk_create()``) are picked up by the rebuild_search_index command.
+
+Queries are reduced to plain words before they reach the database, so
+search syntax typed by users can never produce an invalid match
+expression. All words must match, the last one as a prefix.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.html import escape
+
+from .backends import HIGHLIGHT_END, HIGHLIGHT_START, get_backend
+from .models import SearchDocument
+
+# Words kept from a query
+MAX_TERMS = 16
+TERM_RE = re.compile(r'\w+')
+
+HIGHLIGHT_RE = re.compile(f'[{HIGHLIGHT_START}{HIGHLIGHT_END}]')
+
+REBUILD_BATCH_SIZE = 500
+
+# Registered models by label (e.g. 'news.news')
+SEARCH_MODELS = {}
+
+SearchHit = namedtuple('SearchHit', ['content_type', 'object_id', 'rank', 'title', 'snippet'])
+
+
+class SearchSpec:
+    def __init__(self, model, title_field, body_fields, filter):
+        self.label = model._meta.label_lower
+        self.title_field = title_field
+        self.body_fields = body_fields
+        self.filter = filter or {}
+        self.watched_fields = {title_field, *body_fields, *self.filter}
+
+    def is_searchable(self, obj):
+        return all(getattr(obj, name) == value for name, value in self.filter.items())
+
+    def document(self, obj):
+        title = getattr(obj, self.title_field) or ''
+        body = '\n'.join(str(getattr(obj, name) or '') for name in self.body_fields)
+        return HIGHLIGHT_RE.sub('', str(title)), HIGHLIGHT_RE.sub('', body)
+
+
+def update_document(spec, obj):
+    """Index ``obj``, or drop it from the index if it is not searchable"""
+    documents = SearchDocument.objects.filter(content_type=spec.label, object_id=obj.pk)
+    if not spec.is_searchable(obj):
+        documents.delete()
+        return
+    title, body = spec.document(obj)
+    if not documents.update(title=title, body=body):
+        SearchDocument.objects.create(content_type=spec.label, object_id=obj.pk, title=title, body=body)
+
+
+def _after_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    spec = SEARCH_MODELS[sender._meta.label_lower]
+    if update_fields is not None and not spec.watched_fields.intersection(update_fields):
+        return
+    update_document(spec, instance)
+
+
+def _after_delete(sender, instance, **kwargs):
+    SearchDocument.objects.filter(content_type=sender._meta.label_lower, object_id=instance.pk).delete()
+
+
+def register_search(model, title_field, *body_fields, filter=None):
+    """
+    Make ``model`` searchable by ``title_field`` (ranked higher) and
+    ``body_fields``; ``filter`` is a dict of field values a row needs to be
+    found, e.g. ``{'is_published': True}``
+    """
+    SEARCH_MODELS[model._meta.label_lower] = SearchSpec(model, title_field, body_fields, filter)
+    dispatch_uid = f'search:{model._meta.label_lower}'
+    post_save.connect(_after_save, sender=model, dispatch_uid=dispatch_uid)
+    post_delete.connect(_after_delete, sender=model, dispatch_uid=dispatch_uid)
+
+
+def rebuild(get_model=None, document_model=SearchDocument):
+    """
+    Reindex every registered model from scratch and return the number of
+    documents. ``get_model`` and ``document_model`` let migrations use
+    historical models.
+    """
+    if get_model is None:
+        from django.apps import apps
+        get_model = apps.get_model
+    count = 0
+    with transaction.atomic():
+        document_model.objects.all().delete()
+        for spec in SEARCH_MODELS.values():
+            rows = get_model(spec.label)._default_manager.filter(**spec.filter).iterator(chunk_size=REBUILD_BATCH_SIZE)
+            batch = []
+            for obj in rows:
+                title, body = spec.document(obj)
+                batch.append(document_model(content_type=spec.label, object_id=obj.pk, title=title, body=body))
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    count += len(document_model.objects.bulk_create(batch))
+                    batch = []
+            count += len(document_model.objects.bulk_create(batch))
+    connection = connections[router.db_for_write(document_model)]
+    with connection.cursor() as cursor:
+        cursor.execute(get_backend(connection).optimize_sql)
+    return count
+
+
+def parse_query(query):
+    return TERM_RE.findall(query)[:MAX_TERMS]
+
+
+def _markup(text):
+    return escape(text).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+def search(query, content_types=None, limit=20, offset=0):
+    """
+    Return the SearchHits for ``query`` in ``content_types`` (default: all
+    registered models), best first. ``title`` and ``snippet`` are HTML with
+    the matched words wrapped in <mark>.
+    """
+    terms = parse_query(query)
+    content_types = [label for label in content_types or SEARCH_MODELS if label in SEARCH_MODELS]
+    if not terms or not content_types or limit <= 0:
+        return []
+    connection = connections[router.db_for_read(SearchDocument)]
+    with connection.cursor() as cursor:
+        rows = get_backend(connection).search(cursor, terms, content_types, limit, offset)
+    return [
+        SearchHit(content_type, object_id, rank, _markup(title), _markup(snippet))
+        for content_type, object_id, rank, title, snippet in rows
+    ]
+
+
+def load_objects(hits, querysets=None):
+    """
+    Fetch the objects behind ``hits`` with one query per model, as
+    {label: {pk: object}}; ``querysets`` optionally maps labels to the
+    querysets to load from
+    """
+    from django.apps import apps
+
+    querysets = querysets or {}
+    ids = {}
+    for hit in hits:
+        ids.setdefault(hit.content_type, []).append(hit.object_id)
+    objects = {}
+    for label, pks in ids.items():
+        queryset = querysets.get(label)
+        if queryset is None:
+            queryset = apps.get_model(label)._default_manager.all()
+        # Filtered again, as the index may lag behind bulk updates
+        objects[label] = queryset.filter(**SEARCH_MODELS[label].filter).in_bulk(pks)
+    return objects
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.search.index import rebuild
+
+
+class Command(BaseCommand):
+    help = "Reindex every searchable model, e.g. after bulk updates that bypassed signals"
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents"))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+def create_index(apps, schema_editor):
+    from apps.search.backends import get_backend
+
+    for sql in get_backend(schema_editor.connection).create_sql:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    from apps.search.backends import get_backend
+
+    for sql in get_backend(schema_editor.connection).drop_sql:
+        schema_editor.execute(sql)
+
+
+def index_existing(apps, schema_editor):
+    from apps.search.index import rebuild
+
+    rebuild(apps.get_model, apps.get_model('search', 'SearchDocument'))
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('content', '0003_gallery_gallery_recent_idx'),
+        ('events', '0004_event_event_published_idx_and_more'),
+        ('news', '0003_news_news_published_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id'), name='search_document_object_unique')],
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of one object, kept up to date by apps.search.index.
+    The full-text index itself (FTS5 table or tsvector column) is created
+    by this app's migrations.
+    """
+    content_type = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    title = models.TextField()
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='search_document_object_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_type} {self.object_id}"
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import ChunkedUpload, StoredFile
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'content_type', 'received', 'size', 'status', 'created_by', 'created_at')
+    list_filter = ('status', 'content_type')
+    search_fields = ('filename', 'created_by__email')
+    ordering = ('-created_at',)
+    readonly_fields = ('received', 'path', 'created_at', 'updated_at')
+
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'references', 'updated_at')
+    list_filter = ('references',)
+    search_fields = ('name',)
+    readonly_fields = ('name', 'references', 'created_at', 'updated_at')
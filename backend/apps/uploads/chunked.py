@@ -0,0 +1,189 @@
+"""
+Resumable chunked uploads
+
+An upload is initiated with its filename, content type and total size,
+then its bytes arrive as a series of chunks (see apps.uploads.views) that
+are streamed straight into the upload's file in MEDIA_ROOT, so memory use
+is bounded by the read buffer no matter how large the file is. Once every
+byte has arrived the upload is finalized, and a mutation can then attach
+the file to a model by the upload's ID without copying it.
+
+Partial uploads are kept in a plain filesystem storage under MEDIA_ROOT,
+since chunks are written at an offset into the local file, and are linked
+into the content-addressed store (core.storage) when used; the staged
+file is removed once that transaction commits.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from PIL import Image
+
+from core.storage import ContentAddressedStorage
+
+from .models import ChunkedUpload
+
+UPLOAD_SETTINGS = getattr(settings, 'CHUNKED_UPLOADS', {})
+MAX_SIZE = UPLOAD_SETTINGS.get('MAX_SIZE', 50 * 1024 * 1024)
+MAX_CHUNK_SIZE = UPLOAD_SETTINGS.get('MAX_CHUNK_SIZE', 5 * 1024 * 1024)
+EXPIRY = UPLOAD_SETTINGS.get('EXPIRY', timedelta(hours=24))
+
+READ_BUFFER_SIZE = 64 * 1024
+
+staging_storage = FileSystemStorage()
+
+# Bytes needed from the start of a file to check its signature
+SIGNATURE_LENGTH = 12
+
+SIGNATURES = {
+    'image/jpeg': lambda head: head[:3] == b'\xff\xd8\xff',
+    'image/png': lambda head: head[:8] == b'\x89PNG\r\n\x1a\n',
+    'image/gif': lambda head: head[:6] in (b'GIF87a', b'GIF89a'),
+    'image/webp': lambda head: head[:4] == b'RIFF' and head[8:12] == b'WEBP',
+    'image/avif': lambda head: head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'),
+}
+
+
+class UploadError(Exception):
+    """A rejected upload or chunk; ``status`` is the matching HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def initiate(user, filename, content_type, size):
+    """Validate the declared file and reserve its location in storage"""
+    allowed = UPLOAD_SETTINGS.get('ALLOWED_CONTENT_TYPES', list(SIGNATURES))
+    if content_type not in allowed or content_type not in SIGNATURES:
+        raise UploadError(f"Content type {content_type} is not allowed", 415)
+    if size <= 0:
+        raise UploadError("Upload size must be positive")
+    if size > MAX_SIZE:
+        raise UploadError(f"Upload exceeds the maximum size of {MAX_SIZE} bytes", 413)
+
+    upload = ChunkedUpload(
+        filename=get_valid_filename(os.path.basename(filename)) or 'upload',
+        content_type=content_type,
+        size=size,
+        created_by=user,
+    )
+    upload.path = staging_storage.save(f'uploads/{upload.id}/{upload.filename}', ContentFile(b''))
+    upload.save()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Stream ``length`` bytes from ``stream`` into ``upload`` at ``offset``
+    and return the new offset. A short read (e.g. a dropped connection)
+    keeps whatever arrived, so the client can resume from the new offset.
+    """
+    if upload.status != 'uploading':
+        raise UploadError("Upload is already complete", 409)
+    if offset != upload.received:
+        raise UploadError(f"Expected offset {upload.received}", 409)
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f"Chunk exceeds the maximum size of {MAX_CHUNK_SIZE} bytes", 413)
+    if offset + length > upload.size:
+        raise UploadError("Chunk extends past the declared upload size", 413)
+
+    written = 0
+    with open(staging_storage.path(upload.path), 'r+b') as f:
+        f.seek(offset)
+        while written < length:
+            data = stream.read(min(READ_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            if offset + written < SIGNATURE_LENGTH:
+                _check_signature(upload, f, offset + written, data)
+            f.write(data)
+            written += len(data)
+
+    # Conditional on the old offset so concurrent chunks cannot both advance it
+    updated = ChunkedUpload.objects.filter(pk=upload.pk, received=offset).update(
+        received=offset + written, updated_at=timezone.now()
+    )
+    if not updated:
+        raise UploadError("Upload offset changed concurrently", 409)
+    upload.received = offset + written
+    return upload.received
+
+
+def _check_signature(upload, f, position, data):
+    """Reject the file as soon as its leading bytes are known not to match"""
+    if position:
+        f.seek(0)
+        head = f.read(position) + data
+        f.seek(position)
+    else:
+        head = data
+    needed = min(SIGNATURE_LENGTH, upload.size)
+    if len(head) >= needed and not SIGNATURES[upload.content_type](head[:needed]):
+        raise UploadError(f"File content does not match {upload.content_type}", 415)
+
+
+def finalize(upload):
+    """Check that every byte arrived and the result is a readable image"""
+    if upload.status == 'complete':
+        return upload
+    if upload.received != upload.size:
+        raise UploadError(f"Upload is incomplete ({upload.received} of {upload.size} bytes)", 409)
+    try:
+        with staging_storage.open(upload.path, 'rb') as f:
+            Image.open(f).verify()
+    except Exception:
+        raise UploadError("Uploaded file is not a valid image", 415)
+    upload.status = 'complete'
+    upload.save(update_fields=['status', 'updated_at'])
+    return upload
+
+
+def consume(upload_id, user):
+    """
+    Hand a finalized upload over to a model field: returns the storage name
+    to assign to the field and forgets the upload
+    """
+    upload = ChunkedUpload.objects.filter(pk=upload_id, created_by=user).first()
+    if upload is None:
+        raise UploadError("Upload not found", 404)
+    if upload.status != 'complete':
+        raise UploadError("Upload has not been finalized", 409)
+    if not ChunkedUpload.objects.filter(pk=upload.pk).delete()[0]:
+        raise UploadError("Upload was already used", 409)
+    if not isinstance(default_storage, ContentAddressedStorage):
+        return upload.path
+    name = default_storage.adopt(staging_storage.path(upload.path), upload.filename, link=True)
+    # If the caller's transaction rolls back, the upload row comes back and
+    # still needs its file; the unreferenced copy in the store is left to
+    # clean_media
+    transaction.on_commit(lambda: _delete_staged(upload.path))
+    return name
+
+
+def _delete_staged(path):
+    staging_storage.delete(path)
+    _remove_directory(path)
+
+
+def _remove_directory(path):
+    try:
+        os.rmdir(os.path.dirname(staging_storage.path(path)))
+    except OSError:
+        pass
+
+
+def delete_expired():
+    """Remove uploads that were never used, with their files"""
+    expired = ChunkedUpload.objects.filter(updated_at__lt=timezone.now() - EXPIRY)
+    count = 0
+    for upload in expired.iterator():
+        _delete_staged(upload.path)
+        upload.delete()
+        count += 1
+    return count
@@ -0,0 +1,94 @@
+import os
+import re
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.uploads.models import StoredFile
+from apps.uploads.references import delete_file, delete_unreferenced
+from core.storage import PREFIX
+
+# Derivatives written by core.images: <stem>.<width>w.<format>
+DERIVATIVE_RE = re.compile(r'^(?P<stem>.+)\.\d+w\.[a-z]+$')
+
+
+class Command(BaseCommand):
+    help = "Recount media file references and delete content-addressed files nothing points at"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-period', type=int, default=3600,
+            help="Seconds an unreferenced file must be old before it is deleted, "
+                 "so uploads whose row is still being saved are kept",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Report without deleting")
+
+    def count_references(self):
+        counts = Counter()
+        for model in apps.get_models():
+            for field_name in getattr(model, '_image_derivative_fields', ()):
+                names = model._default_manager.exclude(**{field_name: ''}).exclude(
+                    **{f'{field_name}__isnull': True}
+                ).values_list(field_name, flat=True)
+                counts.update(names)
+        return counts
+
+    def sync_references(self, counts):
+        stored = dict(StoredFile.objects.values_list('name', 'references'))
+        for name, references in stored.items():
+            if counts.get(name, 0) != references:
+                StoredFile.objects.filter(name=name).update(references=counts.get(name, 0))
+        StoredFile.objects.bulk_create([
+            StoredFile(name=name, references=count)
+            for name, count in counts.items() if name not in stored
+        ])
+
+    def stored_files(self):
+        root = default_storage.path(PREFIX)
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                yield path, os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+
+    def handle(self, *args, grace_period, dry_run, **options):
+        counts = self.count_references()
+        if not dry_run:
+            self.sync_references(counts)
+
+        cutoff = time.time() - grace_period
+        originals = set()
+        candidates = []
+        for path, name in self.stored_files():
+            match = DERIVATIVE_RE.match(name)
+            if match is None:
+                originals.add(os.path.splitext(name)[0])
+            if os.path.getmtime(path) < cutoff:
+                candidates.append((name, match))
+
+        deleted = 0
+        for name, match in candidates:
+            if os.path.basename(name).startswith('.upload-'):
+                # Temporary file left by an interrupted save
+                orphaned = True
+            elif match is not None:
+                orphaned = match.group('stem') not in originals
+            else:
+                orphaned = counts.get(name, 0) == 0
+            if not orphaned:
+                continue
+            deleted += 1
+            self.stdout.write(f"Orphaned: {name}")
+            if not dry_run:
+                if match is None:
+                    StoredFile.objects.filter(name=name).delete()
+                    delete_file(name)
+                else:
+                    default_storage.delete(name)
+
+        if not dry_run:
+            deleted += len(delete_unreferenced())
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} orphaned files"))
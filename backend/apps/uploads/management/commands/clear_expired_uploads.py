@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.uploads.chunked import delete_expired
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that were never attached to a model"
+
+    def handle(self, *args, **options):
+        count = delete_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} expired uploads"))
@@ -0,0 +1,65 @@
+"""
+Reference counts for files in media storage
+
+Fields registered with core.images.register_image_fields add a reference
+to the file they point at when saved, and release it when their value
+changes or the row is deleted. Once a content-addressed file has no
+references left it is deleted, together with its derivatives, after the
+transaction commits. The clean_media command recounts references from the
+database and removes anything these signals missed.
+"""
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from core import images
+from core.storage import is_content_addressed
+
+from .models import StoredFile
+
+
+def add_references(names):
+    for name, count in Counter(name for name in names if name).items():
+        if StoredFile.objects.filter(name=name).update(references=F('references') + count):
+            continue
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, references=count)
+        except IntegrityError:
+            # Created concurrently
+            StoredFile.objects.filter(name=name).update(references=F('references') + count)
+
+
+def release_references(names):
+    released = Counter(name for name in names if name)
+    for name, count in released.items():
+        StoredFile.objects.filter(name=name).update(references=Greatest(F('references') - count, 0))
+    if released:
+        transaction.on_commit(lambda: delete_unreferenced(list(released)))
+
+
+def delete_file(name):
+    """Remove ``name`` and its derivatives from storage"""
+    default_storage.delete(name)
+    images.delete_derivatives(default_storage, name)
+
+
+def delete_unreferenced(names=None):
+    """
+    Delete the unreferenced files among ``names`` (or all of them) and
+    return their names. Only content-addressed files are removed from
+    storage; files stored before content addressing are left in place.
+    """
+    unreferenced = StoredFile.objects.filter(references=0)
+    if names is not None:
+        unreferenced = unreferenced.filter(name__in=names)
+    deleted = []
+    for name in unreferenced.values_list('name', flat=True):
+        # Conditional delete: skip files that gained a reference meanwhile
+        if StoredFile.objects.filter(name=name, references=0).delete()[0] and is_content_addressed(name):
+            delete_file(name)
+            deleted.append(name)
+    return deleted
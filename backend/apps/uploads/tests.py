@@ -0,0 +1,56 @@
+import io
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import TestCase
+from PIL import Image
+
+from apps.users.models import User
+
+from . import chunked
+from .models import ChunkedUpload
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ConsumeTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = self.settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.user = User.objects.create_user(username='uploader', email='uploader@example.com')
+        data = png_bytes()
+        self.upload = chunked.initiate(self.user, 'photo.png', 'image/png', len(data))
+        chunked.write_chunk(self.upload, 0, io.BytesIO(data), len(data))
+        chunked.finalize(self.upload)
+
+    def staged(self):
+        return chunked.staging_storage.exists(self.upload.path)
+
+    def test_consume_moves_file_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            name = chunked.consume(self.upload.pk, self.user)
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(self.staged())
+        self.assertFalse(ChunkedUpload.objects.filter(pk=self.upload.pk).exists())
+
+    def test_rolled_back_consume_keeps_upload_file(self):
+        # E.g. the model row the upload was for failing to save
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            chunked.consume(self.upload.pk, self.user)
+            raise RuntimeError
+
+        self.assertTrue(ChunkedUpload.objects.filter(pk=self.upload.pk).exists())
+        self.assertTrue(self.staged())
+        with self.captureOnCommitCallbacks(execute=True):
+            name = chunked.consume(self.upload.pk, self.user)
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(self.staged())
@@ -0,0 +1,47 @@
+"""
+HTTP endpoint receiving the chunks of a resumable upload
+
+``PUT /uploads/<id>/`` with an ``Upload-Offset`` header appends the raw
+request body at that offset; ``HEAD`` reports the current offset so an
+interrupted client knows where to resume. The body is read from the
+request stream in small pieces and never buffered whole.
+"""
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from apps.users.middleware import authenticate_request
+
+from . import chunked
+from .models import ChunkedUpload
+
+
+def _offset_headers(upload):
+    return {'Upload-Offset': str(upload.received), 'Upload-Length': str(upload.size)}
+
+
+@csrf_exempt
+def upload_chunk(request, upload_id):
+    user = authenticate_request(request)
+    if not user.is_authenticated:
+        return JsonResponse({'error': "Authentication required"}, status=401)
+
+    upload = ChunkedUpload.objects.filter(pk=upload_id, created_by=user).first()
+    if upload is None:
+        return JsonResponse({'error': "Upload not found"}, status=404)
+
+    if request.method == 'HEAD':
+        return HttpResponse(headers=_offset_headers(upload))
+    if request.method not in ('PUT', 'PATCH'):
+        return JsonResponse({'error': "Use PUT or PATCH"}, status=405, headers={'Allow': 'HEAD, PUT, PATCH'})
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.META['CONTENT_LENGTH'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "Upload-Offset and Content-Length headers are required"}, status=400)
+
+    try:
+        chunked.write_chunk(upload, offset, request, length)
+    except chunked.UploadError as e:
+        return JsonResponse({'error': str(e), 'offset': upload.received}, status=e.status, headers=_offset_headers(upload))
+    return JsonResponse({'offset': upload.received, 'size': upload.size}, headers=_offset_headers(upload))
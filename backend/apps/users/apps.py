@@ -5,3 +5,10 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
 
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .models import User
+        from .token_cache import invalidate_on_change
+
+        post_save.connect(invalidate_on_change, sender=User, dispatch_uid='users.token_cache')
+        post_delete.connect(invalidate_on_change, sender=User, dispatch_uid='users.token_cache')
@@ -7,54 +7,73 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import BaseBackend
 from datetime import datetime
 
+from .token_cache import token_cache
+
 User = get_user_model()
 
 
+def get_token_from_request(request):
+    """Return the raw JWT from the Authorization header, or None"""
+    prefix = settings.JWT_AUTH.get('JWT_AUTH_HEADER_PREFIX', 'JWT') + ' '
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_header.startswith(prefix):
+        return auth_header[len(prefix):]
+    return None
+
+
+def get_user_from_token(token):
+    """Decode a JWT and return the matching user, or None if it is invalid"""
+    if not token:
+        return None
+
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
+    try:
+        # Decode JWT token
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.JWT_AUTH['JWT_ALGORITHM']]
+        )
+
+        # Check if token is expired
+        if 'exp' in payload:
+            exp = datetime.fromtimestamp(payload['exp'])
+            if exp < datetime.utcnow():
+                return None
+
+        # Get user
+        user_id = payload.get('user_id')
+        if user_id:
+            try:
+                user = User.objects.get(id=user_id)
+            except User.DoesNotExist:
+                return None
+            token_cache.set(token, payload, user)
+            return user
+
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError:
+        return None
+    except Exception:
+        return None
+
+    return None
+
+
 class JWTAuthenticationBackend(BaseBackend):
     """
     Custom JWT authentication backend for GraphQL
     """
-    
+
     def authenticate(self, request, token=None, **kwargs):
-        if not token:
-            return None
-            
-        try:
-            # Decode JWT token
-            payload = jwt.decode(
-                token, 
-                settings.SECRET_KEY, 
-                algorithms=[settings.JWT_AUTH['JWT_ALGORITHM']]
-            )
-            
-            # Check if token is expired
-            if 'exp' in payload:
-                exp = datetime.fromtimestamp(payload['exp'])
-                if exp < datetime.utcnow():
-                    return None
-            
-            # Get user
-            user_id = payload.get('user_id')
-            if user_id:
-                try:
-                    user = User.objects.get(id=user_id)
-                    return user
-                except User.DoesNotExist:
-                    return None
-                    
-        except jwt.ExpiredSignatureError:
-            return None
-        except jwt.InvalidTokenError:
-            return None
-        except Exception:
-            return None
-            
-        return None
-    
+        return get_user_from_token(token)
+
     def get_user(self, user_id):
         try:
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
             return None
-
-
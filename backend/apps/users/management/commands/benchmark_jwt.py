@@ -0,0 +1,71 @@
+import json
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+
+from apps.users.models import User
+from core.response_cache import CACHE_SETTINGS
+
+# Many rows with several fields each, so per-field middleware cost shows
+DEFAULT_QUERY = '{ news { id title content coverImage publishedAt updatedAt isPublished author { id } } }'
+
+
+class Command(BaseCommand):
+    help = "Time an authenticated GraphQL query and count its SQL queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="User the JWT is issued for")
+        parser.add_argument('--query', default=DEFAULT_QUERY, help="GraphQL document to send")
+        parser.add_argument('--requests', type=int, default=20, help="Timed requests")
+
+    @staticmethod
+    def record(queries):
+        def execute(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+        return execute
+
+    def handle(self, *args, username, query, requests, **options):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"User {username} does not exist")
+        payload = {'user_id': user.pk, 'exp': datetime.utcnow() + settings.JWT_AUTH['JWT_EXPIRATION_DELTA']}
+        token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_AUTH['JWT_ALGORITHM'])
+        prefix = settings.JWT_AUTH.get('JWT_AUTH_HEADER_PREFIX', 'JWT')
+
+        client = Client()
+        body = json.dumps({'query': query})
+
+        def send():
+            response = client.post(
+                '/graphql/', body, content_type='application/json', HTTP_AUTHORIZATION=f'{prefix} {token}',
+            )
+            result = json.loads(response.content)
+            if response.status_code != 200 or result.get('errors'):
+                raise CommandError(f"Query failed ({response.status_code}): {result.get('errors')}")
+
+        # Every request executes instead of being served from the cache
+        alias = CACHE_SETTINGS.get('CACHE_ALIAS', 'default')
+        caches = {**settings.CACHES, alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        # The test client's host, as the test runner allows it
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(CACHES=caches, ALLOWED_HOSTS=allowed_hosts):
+            send()
+            # On every alias, as reads may be routed to the replica
+            queries = []
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(self.record(queries)))
+                send()
+            start = time.perf_counter()
+            for i in range(requests):
+                send()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f"{len(queries)} queries, {elapsed / requests * 1000:.1f} ms/request")
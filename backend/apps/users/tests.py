@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta
+
+import jwt
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .models import User
+from .token_cache import token_cache
+
+
+def make_token(user):
+    payload = {'user_id': user.pk, 'exp': datetime.utcnow() + timedelta(hours=1)}
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_AUTH['JWT_ALGORITHM'])
+
+
+# Reads stay on the test transaction's connection instead of the replica
+@override_settings(READ_REPLICA_DATABASE=None)
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            username='member', email='member@example.com', password='old-Passw0rd!', is_admin=True, is_active=True,
+        )
+        self.token = make_token(self.user)
+
+    def graphql(self, query):
+        response = self.client.post(
+            '/graphql/', json.dumps({'query': query}), content_type='application/json',
+            HTTP_AUTHORIZATION=f'JWT {self.token}',
+        )
+        return response.json()
+
+    def test_save_invalidates_cached_token(self):
+        self.graphql('{ me { id } }')
+        self.assertEqual(len(token_cache), 1)
+
+        User.objects.get(pk=self.user.pk).save()
+        self.assertEqual(len(token_cache), 0)
+
+    def test_update_profile_keeps_changes_made_elsewhere(self):
+        self.graphql('{ me { id } }')
+        # E.g. an admin revoking the role in the Django admin
+        user = User.objects.get(pk=self.user.pk)
+        user.is_admin = False
+        user.save()
+
+        result = self.graphql('mutation { updateProfile(firstName: "New") { success } }')
+        self.assertTrue(result['data']['updateProfile']['success'])
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, 'New')
+        self.assertFalse(user.is_admin)
+
+    def test_change_password_only_writes_password(self):
+        self.graphql('{ me { id } }')
+        # Bypasses signals, so the cached snapshot stays stale
+        User.objects.filter(pk=self.user.pk).update(is_admin=False)
+
+        result = self.graphql(
+            'mutation { changePassword(oldPassword: "old-Passw0rd!", newPassword: "new-Passw0rd!") { success } }'
+        )
+        self.assertTrue(result['data']['changePassword']['success'])
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.check_password('new-Passw0rd!'))
+        self.assertFalse(user.is_admin)
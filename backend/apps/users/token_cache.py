@@ -0,0 +1,115 @@
+"""
+In-process cache of verified JWTs
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+class TokenCache:
+    """
+    Bounded LRU cache mapping a token digest to its verified claims and a
+    snapshot of the user's columns.
+
+    Entries live until the token's ``exp`` (capped by ``max_age``). A hit
+    rebuilds a fresh User instance from the snapshot without touching the
+    database. Every save or delete of a User invalidates its entries, but
+    the cache is per process, so that only reaches the worker that made
+    the change; ``max_age`` bounds staleness elsewhere. Code saving such a
+    user must therefore pass ``update_fields``, so stale columns are never
+    written back.
+    """
+
+    def __init__(self, max_size=1024, max_age=300):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._digests_by_user = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        """Return ``(payload, user)`` for a cached token, or None"""
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, user_id, values, expires_at = entry
+            if expires_at <= time.time():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+
+        field_names = [field.attname for field in User._meta.concrete_fields]
+        return payload, User.from_db('default', field_names, values)
+
+    def set(self, token, payload, user):
+        """Store the verified payload and a snapshot of ``user``"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.max_age
+        if 'exp' in payload:
+            expires_at = min(expires_at, payload['exp'])
+        values = tuple(getattr(user, field.attname) for field in User._meta.concrete_fields)
+        key = self.digest(token)
+
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (payload, user.pk, values, expires_at)
+            self._digests_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        """Drop every cached token belonging to ``user_id``"""
+        with self._lock:
+            for key in list(self._digests_by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1]
+        digests = self._digests_by_user.get(user_id)
+        if digests is not None:
+            digests.discard(key)
+            if not digests:
+                del self._digests_by_user[user_id]
+
+
+token_cache = TokenCache(
+    max_size=settings.JWT_AUTH.get('JWT_TOKEN_CACHE_SIZE', 1024),
+    max_age=settings.JWT_AUTH.get('JWT_TOKEN_CACHE_MAX_AGE', timedelta(minutes=5)).total_seconds(),
+)
+
+
+def invalidate_user_tokens(user_id):
+    """Forget cached tokens for a user whose account has changed"""
+    token_cache.invalidate_user(int(user_id))
+
+
+def invalidate_on_change(sender, instance, raw=False, **kwargs):
+    # Every save or delete, wherever it comes from (mutations, the admin,
+    # the shell), so a snapshot never outlives the row it was taken from
+    if not raw and instance.pk is not None:
+        invalidate_user_tokens(instance.pk)
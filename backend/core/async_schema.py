@@ -0,0 +1,50 @@
+"""
+Async variant of the GraphQL schema, used by AsyncGraphQLView
+
+Every root Query resolver runs the synchronous resolver from core.schema in
+a worker thread and fully evaluates its result there. The optimizer has
+already planned select_related/prefetch_related for the whole selection
+set, so the nested (synchronous) resolvers only read loaded rows and never
+touch the database from the event loop.
+"""
+import graphene
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import QuerySet
+
+from core.schema import Mutation, Query
+
+
+def run_in_thread(resolver):
+    """Wrap a sync root resolver as a coroutine that runs it in a worker thread"""
+
+    def run(root, info, **kwargs):
+        try:
+            result = resolver(root, info, **kwargs)
+            if isinstance(result, QuerySet):
+                result = list(result)
+            return result
+        finally:
+            close_old_connections()
+
+    # Not thread-sensitive, so sibling root fields run in parallel threads
+    # instead of queueing on Django's single sync thread
+    run_async = sync_to_async(run, thread_sensitive=False)
+
+    async def resolve(root, info, **kwargs):
+        return await run_async(root, info, **kwargs)
+
+    return resolve
+
+
+class AsyncQuery(Query):
+    class Meta:
+        name = 'Query'
+
+
+for _name, _resolver in list(vars(Query).items()):
+    if _name.startswith('resolve_'):
+        setattr(AsyncQuery, _name, run_in_thread(_resolver))
+
+
+schema = graphene.Schema(query=AsyncQuery, mutation=Mutation)
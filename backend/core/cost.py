@@ -0,0 +1,142 @@
+"""
+Static cost and depth analysis for GraphQL operations
+
+Every field that returns an object costs 1 (or its FIELD_COSTS override),
+scalars are free, and the cost of a list field's selection is multiplied by
+the list's expected size: the ``first``/``last`` argument on connection
+fields, otherwise LIST_SIZES or DEFAULT_LIST_SIZE.
+"""
+from django.conf import settings
+from graphene.relay import Connection
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    InlineFragmentNode,
+    OperationType,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_composite_type,
+    value_from_ast,
+)
+
+COST_SETTINGS = getattr(settings, 'GRAPHQL_QUERY_COST', {})
+
+
+class QueryCostError(GraphQLError):
+    pass
+
+
+def _is_list(graphql_type):
+    return isinstance(get_nullable_type(graphql_type), GraphQLList)
+
+
+def _is_connection(graphql_type):
+    graphene_type = getattr(get_named_type(graphql_type), 'graphene_type', None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, Connection)
+
+
+class CostAnalyzer:
+    def __init__(self, schema, document, variables):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.default_list_size = COST_SETTINGS.get('DEFAULT_LIST_SIZE', 50)
+        self.list_sizes = COST_SETTINGS.get('LIST_SIZES', {})
+        self.field_costs = COST_SETTINGS.get('FIELD_COSTS', {})
+        self.max_depth = 0
+
+    def _page_size(self, field_def, node):
+        values = {}
+        for argument in node.arguments:
+            name = argument.name.value
+            if name in ('first', 'last') and name in field_def.args:
+                values[name] = value_from_ast(argument.value, field_def.args[name].type, self.variables)
+        max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+        # Out-of-range sizes are rejected when the field executes; until
+        # then a negative one must not discount its siblings' cost
+        sizes = [min(max(value, 0), max_limit) for value in values.values() if isinstance(value, int)]
+        return min(sizes) if sizes else max_limit
+
+    def selection_cost(self, parent_type, selection_set, depth, in_connection=False):
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost += self.field_cost(parent_type, selection, depth, in_connection)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                cost += self.selection_cost(fragment_type, selection.selection_set, depth, in_connection)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments[selection.name.value]
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                cost += self.selection_cost(fragment_type, fragment.selection_set, depth, in_connection)
+        return cost
+
+    def field_cost(self, parent_type, node, depth, in_connection):
+        name = node.name.value
+        if name.startswith('__'):
+            return 0
+        self.max_depth = max(self.max_depth, depth)
+
+        field_def = parent_type.fields[name]
+        key = f'{parent_type.name}.{name}'
+        if not is_composite_type(get_named_type(field_def.type)):
+            return self.field_costs.get(key, 0)
+
+        multiplier = 1
+        connection = _is_connection(field_def.type)
+        if connection:
+            multiplier = self._page_size(field_def, node)
+        elif _is_list(field_def.type) and not (in_connection and name == 'edges'):
+            multiplier = self.list_sizes.get(key, self.default_list_size)
+
+        children = 0
+        if node.selection_set is not None:
+            children = self.selection_cost(get_named_type(field_def.type), node.selection_set, depth + 1, connection)
+        return self.field_costs.get(key, 1) + multiplier * children
+
+
+def analyze(schema, document, operation_name, variables):
+    """
+    Return ``{'cost': ..., 'depth': ...}`` for the operation that will run,
+    or None if it cannot be determined
+    """
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return None
+    root_type = {
+        OperationType.QUERY: schema.query_type,
+        OperationType.MUTATION: schema.mutation_type,
+        OperationType.SUBSCRIPTION: schema.subscription_type,
+    }[operation.operation]
+    analyzer = CostAnalyzer(schema, document, variables)
+    cost = analyzer.selection_cost(root_type, operation.selection_set, 1)
+    return {'cost': cost, 'depth': analyzer.max_depth}
+
+
+def check_limits(analysis):
+    """Return QueryCostErrors for an analysis that exceeds the configured limits"""
+    errors = []
+    max_cost = COST_SETTINGS.get('MAX_COST')
+    max_depth = COST_SETTINGS.get('MAX_DEPTH')
+    if max_cost is not None and analysis['cost'] > max_cost:
+        errors.append(QueryCostError(
+            f"Query cost {analysis['cost']} exceeds the maximum allowed cost of {max_cost}.",
+            extensions={'code': 'QUERY_TOO_COMPLEX'},
+        ))
+    if max_depth is not None and analysis['depth'] > max_depth:
+        errors.append(QueryCostError(
+            f"Query depth {analysis['depth']} exceeds the maximum allowed depth of {max_depth}.",
+            extensions={'code': 'QUERY_TOO_DEEP'},
+        ))
+    return errors
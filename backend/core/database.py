@@ -0,0 +1,175 @@
+"""
+Database connection setup
+
+Every new SQLite connection is tuned with DEFAULT_PRAGMAS, or with the
+SQLITE_PRAGMAS setting when it is defined. WAL journaling lets readers
+carry on while a write is in progress, ``synchronous = normal`` is durable
+enough in WAL mode and saves an fsync per commit, ``busy_timeout`` makes a
+writer wait for the lock instead of failing with "database is locked", and
+the cache, mmap and temp_store settings keep hot pages and temporary tables
+in memory.
+
+Transactions are opened with BEGIN IMMEDIATE (the ``transaction_mode``
+database option), so a transaction that reads before it writes takes the
+write lock up front rather than failing when it tries to upgrade its read
+lock.
+
+``journal_mode = wal`` is stored in the database file itself: the first
+connection converts an existing db.sqlite3 once and for good, and SQLite
+keeps ``db.sqlite3-wal`` and ``db.sqlite3-shm`` beside it from then on. To
+hand the file to a tool that expects a rollback journal, stop the server
+and run ``sqlite3 db.sqlite3 'PRAGMA journal_mode = delete'``. The
+``benchmark_sqlite`` command compares concurrent reads and writes with and
+without these settings.
+
+ReadReplicaRouter sends reads made while ``read_replica()`` is active
+(GraphQL query operations, see core.views) to the READ_REPLICA_DATABASE
+alias: a second, read-only (``mode=ro``) connection to the same SQLite file,
+or a replica on other backends. Everything else, including every write and
+all reads made by mutations, uses the primary. Read-only connections skip
+the PRAGMAs that modify the file (FILE_PRAGMAS); the primary connection is
+opened first so that it has applied them.
+
+The database backends in core.backends time every connection they open
+(persistent connections are only opened once per CONN_MAX_AGE; pooled
+ones are checked out of the pool), for ConnectionTimingMiddleware and the
+process-wide ``connection_stats()``.
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Used unless the SQLITE_PRAGMAS setting replaces them
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,  # milliseconds
+    'cache_size': -20000,  # negative: KiB, i.e. 20 MB per connection
+    'mmap_size': 134217728,  # 128 MB
+    'temp_store': 'memory',
+}
+
+# PRAGMAs that change the database file rather than the connection, so
+# read-only (``mode=ro``) connections cannot apply them
+FILE_PRAGMAS = {'journal_mode'}
+
+IDENTIFIER_RE = re.compile(r'^[a-z_]+$', re.IGNORECASE)
+
+# Set once a writable connection in this process has applied the file
+# PRAGMAs, which then stay in effect for every connection to the file
+_file_configured = threading.Event()
+
+
+def _pragma(name, value):
+    # PRAGMA does not take parameters, so names and values are checked
+    if not IDENTIFIER_RE.match(name):
+        raise ImproperlyConfigured(f"Invalid SQLite PRAGMA name: {name!r}")
+    if isinstance(value, bool) or not isinstance(value, int) and not IDENTIFIER_RE.match(str(value)):
+        raise ImproperlyConfigured(f"Invalid value for SQLite PRAGMA {name}: {value!r}")
+    return f'PRAGMA {name} = {value}'
+
+
+def is_read_only(connection):
+    name = str(connection.settings_dict['NAME'])
+    return name.startswith('file:') and parse_qs(urlsplit(name).query).get('mode') == ['ro']
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver applying the PRAGMAs to SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+    read_only = is_read_only(connection)
+    if read_only:
+        if FILE_PRAGMAS.intersection(pragmas) and not _file_configured.is_set():
+            # The replica reads the primary's file: have the primary switch
+            # it (e.g. to WAL) before anything reads it
+            connections[DEFAULT_DB_ALIAS].ensure_connection()
+        pragmas = {name: value for name, value in pragmas.items() if name not in FILE_PRAGMAS}
+    # busy_timeout first: switching journal_mode may wait for other connections
+    names = sorted(pragmas, key=lambda name: name != 'busy_timeout')
+    with connection.cursor() as cursor:
+        for name in names:
+            cursor.execute(_pragma(name, pragmas[name]))
+    if not read_only:
+        _file_configured.set()
+
+
+def _replica_alias():
+    alias = getattr(settings, 'READ_REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+# Alias reads are routed to, set by read_replica()
+_read_alias = ContextVar('read_alias', default=None)
+
+
+@contextmanager
+def read_replica():
+    """Route the reads made in this block (and its threads) to the replica"""
+    token = _read_alias.set(_replica_alias())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Explicit, as instances read from the replica would otherwise be
+        # saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, _replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == _replica_alias():
+            return False
+        return None
+
+
+# (alias, seconds) for each connection opened while handling the current
+# request, set by core.middleware.ConnectionTimingMiddleware
+connection_setups = ContextVar('connection_setups', default=None)
+
+_stats_lock = threading.Lock()
+_stats = {'opened': 0, 'setup_seconds': 0.0}
+
+
+class TimedConnectMixin:
+    """DatabaseWrapper mixin recording how long opening each connection takes"""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        duration = time.perf_counter() - start
+        setups = connection_setups.get()
+        if setups is not None:
+            setups.append((self.alias, duration))
+        with _stats_lock:
+            _stats['opened'] += 1
+            _stats['setup_seconds'] += duration
+
+
+def connection_stats():
+    with _stats_lock:
+        opened, seconds = _stats['opened'], _stats['setup_seconds']
+    return {
+        'opened': opened,
+        'setup_ms_total': round(seconds * 1000, 1),
+        'setup_ms_average': round(seconds * 1000 / opened, 2) if opened else None,
+    }
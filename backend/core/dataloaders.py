@@ -0,0 +1,140 @@
+"""
+Per-request DataLoaders for batching related-object lookups in GraphQL
+"""
+from inspect import isawaitable
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from graphene.relay import Connection
+
+from apps.events.models import Event
+from apps.content.models import DojoLocation, Instructor
+
+User = get_user_model()
+
+# Request attribute holding the request's Loaders registry
+LOADERS_ATTR = '_dataloaders'
+
+# Instance attribute pointing at the list the instance was resolved in
+SIBLINGS_ATTR = '_dataloader_siblings'
+
+
+class DataLoader:
+    """
+    Batch and cache loads of one kind of key for the life of a request.
+
+    Graphene executes synchronously and depth-first, so keys are not queued
+    up front. Instead each ``load`` receives the keys of the object's
+    siblings (the other rows of the list it came from) and fetches all of
+    the missing ones in a single call to ``batch_load_fn``.
+    """
+
+    def __init__(self, batch_load_fn):
+        self.batch_load_fn = batch_load_fn
+        self._cache = {}
+
+    def load(self, key, sibling_keys=()):
+        if key not in self._cache:
+            keys = [k for k in dict.fromkeys([key, *sibling_keys]) if k is not None and k not in self._cache]
+            self._cache.update(zip(keys, self.batch_load_fn(keys)))
+        return self._cache[key]
+
+
+def mark_siblings(objects):
+    """Tag each model instance in ``objects`` with the list it belongs to"""
+    for obj in objects:
+        if hasattr(obj, '_meta') and not hasattr(obj, SIBLINGS_ATTR):
+            setattr(obj, SIBLINGS_ATTR, objects)
+    return objects
+
+
+def _by_id(model):
+    def batch_load(keys):
+        objects = {obj.pk: obj for obj in mark_siblings(list(model.objects.filter(pk__in=keys)))}
+        return [objects.get(key) for key in keys]
+    return batch_load
+
+
+def _instructors_by_dojo_location(keys):
+    instructors = list(Instructor.objects.filter(dojo_location_id__in=keys))
+    mark_siblings(instructors)
+    grouped = {key: [] for key in keys}
+    for instructor in instructors:
+        grouped[instructor.dojo_location_id].append(instructor)
+    return [grouped[key] for key in keys]
+
+
+class Loaders:
+    """The set of DataLoaders available to resolvers during one request"""
+
+    def __init__(self):
+        self.users_by_id = DataLoader(_by_id(User))
+        self.events_by_id = DataLoader(_by_id(Event))
+        self.dojo_locations_by_id = DataLoader(_by_id(DojoLocation))
+        self.instructors_by_dojo_location = DataLoader(_instructors_by_dojo_location)
+
+
+def get_loaders(info):
+    request = info.context
+    loaders = getattr(request, LOADERS_ATTR, None)
+    if loaders is None:
+        loaders = Loaders()
+        setattr(request, LOADERS_ATTR, loaders)
+    return loaders
+
+
+def _siblings(obj):
+    return getattr(obj, SIBLINGS_ATTR, (obj,))
+
+
+def load_foreign_key(info, obj, field_name, loader_name):
+    """Resolve ``obj.<field_name>`` through the named loader"""
+    field = obj._meta.get_field(field_name)
+    if field.is_cached(obj):
+        related = getattr(obj, field_name)
+        if related is not None and not hasattr(related, SIBLINGS_ATTR):
+            # Loaded by select_related: batch over the siblings' related rows
+            mark_siblings([
+                getattr(sibling, field_name) for sibling in _siblings(obj)
+                if field.is_cached(sibling) and getattr(sibling, field_name) is not None
+            ])
+        return related
+    key = getattr(obj, field.attname)
+    if key is None:
+        return None
+    loader = getattr(get_loaders(info), loader_name)
+    return loader.load(key, [getattr(sibling, field.attname) for sibling in _siblings(obj)])
+
+
+def load_reverse(info, obj, related_name, loader_name):
+    """Resolve the reverse relation ``obj.<related_name>`` through the named loader"""
+    prefetched = getattr(obj, '_prefetched_objects_cache', {})
+    if related_name in prefetched:
+        return list(prefetched[related_name])
+    loader = getattr(get_loaders(info), loader_name)
+    return loader.load(obj.pk, [sibling.pk for sibling in _siblings(obj)])
+
+
+class DataLoaderMiddleware:
+    """
+    GraphQL middleware that tags list results so loaders can batch over them
+    """
+
+    def resolve(self, next, root, info, **args):
+        result = next(root, info, **args)
+        if isawaitable(result):
+            return self._mark_async(result)
+        return self._mark(result)
+
+    async def _mark_async(self, result):
+        return self._mark(await result)
+
+    @staticmethod
+    def _mark(result):
+        if isinstance(result, QuerySet):
+            result = mark_siblings(list(result))
+        elif isinstance(result, list):
+            mark_siblings(result)
+        elif isinstance(result, Connection):
+            mark_siblings([edge.node for edge in result.edges])
+        return result
@@ -0,0 +1,82 @@
+"""
+LRU cache of parsed and validated GraphQL documents
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from graphql import print_ast
+
+
+class CachedDocument:
+    """A parsed document (or None on a syntax error) and its validation errors"""
+
+    __slots__ = ('document', 'errors', '_normalized')
+
+    def __init__(self, document, errors):
+        self.document = document
+        self.errors = errors
+        self._normalized = None
+
+    @property
+    def normalized(self):
+        """The document printed back in canonical form"""
+        if self._normalized is None and self.document is not None:
+            self._normalized = print_ast(self.document)
+        return self._normalized
+
+
+class DocumentCache:
+    """
+    Bounded, thread-safe LRU keyed by query string.
+
+    ``hits``, ``misses`` and ``evictions`` are cumulative for the process and
+    reported by ``info()``.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query, parse_and_validate):
+        """
+        Return the CachedDocument for ``query``, calling
+        ``parse_and_validate(query)`` to build it on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None:
+                self._entries.move_to_end(query)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = CachedDocument(*parse_and_validate(query))
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[query] = entry
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+
+document_cache = DocumentCache(max_size=getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 1000))
@@ -0,0 +1,351 @@
+"""
+Responsive derivatives for uploaded images
+
+Every registered ImageField gets a downscaled copy of its image at each
+configured width, in the original format plus WebP/AVIF where Pillow
+supports them. Derivatives are stored next to the original
+(``news/photo.jpeg`` -> ``news/photo.320w.webp``) and are never upscaled.
+
+Each image also gets layout metadata (dimensions, dominant color and a
+tiny blurred placeholder) stored in the ``<field>_metadata`` JSON column
+next to the field. Both run in the background job queue (apps.jobs) after
+each upload, which first replaces an original that carries EXIF or XMP
+metadata (camera details, GPS position) with a copy without it, as the
+original is served too.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_delete, post_save, pre_save
+from PIL import Image, ImageFilter, ImageOps, features
+
+from apps.jobs.queue import enqueue
+from apps.uploads import references
+from core.response_cache import invalidate_tags
+
+IMAGE_SETTINGS = getattr(settings, 'IMAGE_DERIVATIVES', {})
+WIDTHS = sorted(IMAGE_SETTINGS.get('WIDTHS', [320, 640, 1024, 1600]))
+QUALITY = IMAGE_SETTINGS.get('QUALITY', 80)
+PLACEHOLDER_SIZE = IMAGE_SETTINGS.get('PLACEHOLDER_SIZE', 16)
+# Quality for originals re-encoded without their metadata; unrotated JPEGs
+# keep their own quantization tables instead
+ORIGINAL_QUALITY = IMAGE_SETTINGS.get('ORIGINAL_QUALITY', 95)
+
+ORIGINAL = 'original'
+
+# Pillow save format for each derivative format
+PIL_FORMATS = {'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP', 'avif': 'AVIF'}
+
+# Extensions whose derivatives keep the original format
+EXTENSION_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png', '.webp': 'webp'}
+
+
+def _supported(fmt):
+    try:
+        return features.check(fmt)
+    except ValueError:
+        return False
+
+
+FORMATS = [
+    fmt for fmt in IMAGE_SETTINGS.get('FORMATS', ['webp', 'avif'])
+    if _supported(fmt)
+]
+
+
+def source_format(name):
+    """Derivative format matching the original's extension ('jpeg' if unknown)"""
+    return EXTENSION_FORMATS.get(os.path.splitext(name)[1].lower(), 'jpeg')
+
+
+def resolve_format(name, fmt):
+    """Map a requested format to one that derivatives exist in"""
+    if fmt in (None, ORIGINAL) or fmt not in FORMATS:
+        return source_format(name)
+    return fmt
+
+
+def derivative_name(name, width, fmt):
+    stem = os.path.splitext(name)[0]
+    return f'{stem}.{width}w.{fmt}'
+
+
+def _formats_for(name):
+    formats = [source_format(name)]
+    formats.extend(fmt for fmt in FORMATS if fmt not in formats)
+    return formats
+
+
+def _save(image, fmt):
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    options = {'optimize': True} if fmt in ('jpeg', 'png') else {}
+    if fmt != 'png':
+        options['quality'] = QUALITY
+    image.save(buffer, PIL_FORMATS[fmt], **options)
+    return ContentFile(buffer.getvalue())
+
+
+def without_metadata(image):
+    """
+    A copy of the opened ``image`` without EXIF and XMP metadata, with its
+    EXIF orientation applied, as a ContentFile in the same format; None if
+    it has none (or is in a format that is not rewritten)
+    """
+    fmt = (image.format or '').lower()
+    has_metadata = image.getexif() or 'xmp' in image.info or 'XML:com.adobe.xmp' in image.info
+    if fmt not in PIL_FORMATS or not has_metadata:
+        return None
+    options = {'icc_profile': image.info['icc_profile']} if image.info.get('icc_profile') else {}
+    if fmt == 'png':
+        options['optimize'] = True
+    elif fmt == 'jpeg' and image.getexif().get(0x0112, 1) == 1:
+        # Pillow only writes EXIF when asked to, so the pixels can be kept
+        options.update(quality='keep', subsampling='keep')
+    else:
+        options['quality'] = ORIGINAL_QUALITY
+        image = ImageOps.exif_transpose(image)
+    buffer = BytesIO()
+    image.save(buffer, PIL_FORMATS[fmt], **options)
+    return ContentFile(buffer.getvalue())
+
+
+def strip_metadata(instance, field_name):
+    """
+    Point ``field_name`` at a copy of its image without metadata, if the
+    original has any, moving the file reference over. Returns the new name.
+    """
+    fieldfile = getattr(instance, field_name)
+    with fieldfile.storage.open(fieldfile.name, 'rb') as f:
+        content = without_metadata(Image.open(f))
+    if content is None:
+        return None
+    old_name = fieldfile.name
+    # Through upload_to, as saving under a content-addressed name would
+    # overwrite the original in place
+    name = fieldfile.storage.save(fieldfile.field.generate_filename(instance, os.path.basename(old_name)), content)
+    # Only if the field still holds this file
+    manager = type(instance)._default_manager
+    if not manager.filter(pk=instance.pk, **{field_name: old_name}).update(**{field_name: name}):
+        return None
+    references.add_references([name])
+    references.release_references([old_name])
+    fieldfile.name = name
+    return name
+
+
+def generate_derivatives(fieldfile, overwrite=False):
+    """
+    Write missing derivatives for ``fieldfile`` and return their names.
+
+    Only the image header is read when every derivative already exists, so
+    calling this on an unchanged image is cheap.
+    """
+    storage = fieldfile.storage
+    name = fieldfile.name
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        source_width = image.width
+        if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            # Rotated by 90 degrees: the displayed width is the stored height
+            source_width = image.height
+
+        pending = []
+        for width in WIDTHS:
+            if width >= source_width:
+                break
+            for fmt in _formats_for(name):
+                target = derivative_name(name, width, fmt)
+                if overwrite or not storage.exists(target):
+                    pending.append((width, fmt, target))
+        if not pending:
+            return []
+
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    resized = {}
+    created = []
+    for width, fmt, target in pending:
+        if width not in resized:
+            height = max(1, round(image.height * width / image.width))
+            resized[width] = image.resize((width, height), Image.LANCZOS)
+        if storage.exists(target):
+            storage.delete(target)
+        created.append(storage.save(target, _save(resized[width], fmt)))
+    return created
+
+
+def open_image(fieldfile):
+    """Decode ``fieldfile`` with its EXIF orientation applied"""
+    with fieldfile.storage.open(fieldfile.name, 'rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    return image
+
+
+def image_metadata(image):
+    """Width, height, dominant color and a base64 blur placeholder for ``image``"""
+    rgb = image.convert('RGB')
+
+    sample = rgb.copy()
+    sample.thumbnail((64, 64))
+    palette = sample.quantize(colors=8)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+
+    thumbnail = rgb.copy()
+    thumbnail.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    thumbnail = thumbnail.filter(ImageFilter.GaussianBlur(1))
+    fmt = 'webp' if 'webp' in FORMATS else 'jpeg'
+    buffer = BytesIO()
+    thumbnail.save(buffer, PIL_FORMATS[fmt], quality=40)
+
+    return {
+        'width': image.width,
+        'height': image.height,
+        'dominant_color': f'#{red:02x}{green:02x}{blue:02x}',
+        'placeholder': f'data:image/{fmt};base64,{base64.b64encode(buffer.getvalue()).decode()}',
+    }
+
+
+def delete_derivatives(storage, name):
+    for width in WIDTHS:
+        for fmt in _formats_for(name):
+            storage.delete(derivative_name(name, width, fmt))
+
+
+def derivative_names(name, fmt=None):
+    """``(width, name)`` for every configured width of ``name`` in ``fmt``"""
+    fmt = resolve_format(name, fmt)
+    return [(width, derivative_name(name, width, fmt)) for width in WIDTHS]
+
+
+def available_derivatives(fieldfile, fmt=None, metadata=None):
+    """
+    ``(width, name)`` for the derivatives of ``fieldfile`` that exist in
+    ``fmt``, narrowest first. Once an image is processed its metadata says
+    which widths were rendered (those narrower than the image), so storage
+    is only checked for images still waiting on the job queue.
+    """
+    names = derivative_names(fieldfile.name, fmt)
+    if metadata:
+        return [(width, name) for width, name in names if width < metadata['width']]
+    return [(width, name) for width, name in names if fieldfile.storage.exists(name)]
+
+
+def image_name(fieldfile, width=None, fmt=None, metadata=None):
+    """
+    Storage name of the smallest derivative at least ``width`` wide,
+    falling back to the original when no such derivative exists
+    """
+    if not fieldfile:
+        return None
+    if width is None and fmt in (None, ORIGINAL):
+        return fieldfile.name
+    for candidate_width, name in available_derivatives(fieldfile, fmt, metadata):
+        if width is None or candidate_width >= width:
+            return name
+    return fieldfile.name
+
+
+def image_srcset(fieldfile, fmt=None, metadata=None):
+    """``(name, width)`` pairs for the derivatives that exist, narrowest first"""
+    if not fieldfile:
+        return []
+    return [(name, width) for width, name in available_derivatives(fieldfile, fmt, metadata)]
+
+
+def process_image(instance, field_name, overwrite=False):
+    """
+    Strip the metadata of one image field's original, render its
+    derivatives and store its layout metadata. Returns the names of the
+    derivatives written.
+    """
+    fieldfile = getattr(instance, field_name)
+    if not fieldfile:
+        return []
+    strip_metadata(instance, field_name)
+    created = generate_derivatives(fieldfile, overwrite=overwrite)
+    metadata_field = f'{field_name}_metadata'
+    if overwrite or getattr(instance, metadata_field) is None:
+        metadata = image_metadata(open_image(fieldfile))
+        # Only if the field still holds this file
+        type(instance)._default_manager.filter(
+            pk=instance.pk, **{field_name: fieldfile.name}
+        ).update(**{metadata_field: metadata})
+        setattr(instance, metadata_field, metadata)
+    return created
+
+
+def process_image_upload(model_label, pk, field_name):
+    """Background job run after an image is uploaded to ``field_name``"""
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return
+    process_image(instance, field_name)
+    if model._image_cache_tag:
+        # Cached responses lack the new derivatives and metadata
+        invalidate_tags(model._image_cache_tag)
+
+
+def _track_uploads(sender, instance, raw=False, **kwargs):
+    # Compare against the stored names: an upload assigned to the field is
+    # still uncommitted here, but FieldFile.save() writes the file first
+    field_names = sender._image_derivative_fields
+    stored = {}
+    if not instance._state.adding:
+        stored = sender._default_manager.filter(pk=instance.pk).values(*field_names).first() or {}
+    instance._previous_image_names = stored
+    instance._uploaded_image_fields = [
+        field_name for field_name in field_names
+        if getattr(instance, field_name) and (
+            not getattr(instance, field_name)._committed
+            or getattr(instance, field_name).name != stored.get(field_name)
+        )
+    ]
+    # Metadata describes the previous file until the upload is processed
+    for field_name in instance._uploaded_image_fields:
+        setattr(instance, f'{field_name}_metadata', None)
+
+
+def _after_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changed = [
+        field_name for field_name in sender._image_derivative_fields
+        if getattr(instance, field_name).name != instance._previous_image_names.get(field_name)
+    ]
+    references.add_references(getattr(instance, field_name).name for field_name in changed)
+    references.release_references(instance._previous_image_names.get(field_name) for field_name in changed)
+    for field_name in instance._uploaded_image_fields:
+        enqueue(process_image_upload, sender._meta.label, instance.pk, field_name)
+    instance._previous_image_names = {}
+    instance._uploaded_image_fields = []
+
+
+def _after_delete(sender, instance, **kwargs):
+    references.release_references(
+        getattr(instance, field_name).name for field_name in sender._image_derivative_fields
+    )
+
+
+def register_image_fields(model, *field_names, cache_tag=None):
+    """
+    Queue post-processing for ``field_names`` whenever a new file is saved
+    on ``model``, and keep the files' reference counts up to date. Each
+    field needs a ``<field>_metadata`` JSONField; ``cache_tag`` is the
+    response cache tag to invalidate once processing is done.
+    """
+    model._image_derivative_fields = field_names
+    model._image_cache_tag = cache_tag
+    dispatch_uid = f'image_derivatives:{model._meta.label}'
+    pre_save.connect(_track_uploads, sender=model, dispatch_uid=dispatch_uid)
+    post_save.connect(_after_save, sender=model, dispatch_uid=dispatch_uid)
+    post_delete.connect(_after_delete, sender=model, dispatch_uid=dispatch_uid)
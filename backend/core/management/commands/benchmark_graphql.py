@@ -0,0 +1,129 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from core.response_cache import CACHE_SETTINGS
+from core.views import AsyncGraphQLView, GraphQLView
+
+# Independent root fields, which the async view resolves concurrently
+DEFAULT_QUERY = '{ events { title } galleryItems { title } karateAdventures { title } instructors { name } }'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare GraphQLView (threaded, as under WSGI) with AsyncGraphQLView "
+        "(one event loop, as under ASGI) on the same query"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', default=DEFAULT_QUERY, help="GraphQL document to send")
+        parser.add_argument('--requests', type=int, default=100, help="Requests per view")
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help="Requests in flight at once (WSGI worker threads, or concurrent ASGI requests)",
+        )
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help="Milliseconds added to every SQL statement, to simulate a database server",
+        )
+        parser.add_argument(
+            '--response-cache', action='store_true',
+            help="Serve repeated public queries from the response cache (off, so every request executes)",
+        )
+
+    def handle(self, *args, query, requests, concurrency, latency, response_cache, **options):
+        if requests < 1 or concurrency < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+        self.body = json.dumps({'query': query})
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(self.delay(latency / 1000))
+
+        caches = settings.CACHES
+        if not response_cache:
+            alias = CACHE_SETTINGS.get('CACHE_ALIAS', 'default')
+            caches = {**caches, alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        # Connections opened from here on (one per thread) get the delay
+        connections.close_all()
+        if latency:
+            connection_created.connect(add_latency, dispatch_uid='benchmark_graphql')
+        try:
+            with override_settings(CACHES=caches):
+                self.report('sync', self.run_sync(requests, concurrency))
+                self.report('async', asyncio.run(self.run_async(requests, concurrency)))
+        finally:
+            connection_created.disconnect(dispatch_uid='benchmark_graphql')
+            connections.close_all()
+
+    @staticmethod
+    def delay(seconds):
+        def execute(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+        return execute
+
+    def check_response(self, response):
+        result = json.loads(response.content)
+        if response.status_code != 200 or result.get('errors'):
+            raise CommandError(f"Query failed ({response.status_code}): {result.get('errors')}")
+
+    def run_sync(self, requests, concurrency):
+        view = GraphQLView.as_view()
+        factory = RequestFactory()
+
+        def timed():
+            start = time.perf_counter()
+            response = view(factory.post('/graphql/', self.body, content_type='application/json'))
+            elapsed = time.perf_counter() - start
+            self.check_response(response)
+            return elapsed
+
+        def worker(count):
+            try:
+                return [timed() for i in range(count)]
+            finally:
+                connections.close_all()
+
+        # Warm up the document cache and the schema outside the timings
+        timed()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            shares = [len(range(i, requests, concurrency)) for i in range(concurrency)]
+            batches = list(pool.map(worker, shares))
+        return time.perf_counter() - start, [elapsed for batch in batches for elapsed in batch]
+
+    async def run_async(self, requests, concurrency):
+        view = AsyncGraphQLView.as_view()
+        factory = AsyncRequestFactory()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def timed():
+            async with slots:
+                start = time.perf_counter()
+                response = await view(factory.post('/graphql/', self.body, content_type='application/json'))
+                elapsed = time.perf_counter() - start
+            self.check_response(response)
+            return elapsed
+
+        # Warm up the document cache and the schema outside the timings
+        await timed()
+        start = time.perf_counter()
+        timings = await asyncio.gather(*(timed() for i in range(requests)))
+        return time.perf_counter() - start, timings
+
+    def report(self, label, run):
+        total, timings = run
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:5} {len(timings)} requests in {total:.2f} s ({len(timings) / total:.1f}/s), "
+            f"latency mean {statistics.mean(timings) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+        )
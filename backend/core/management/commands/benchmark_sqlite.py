@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Seconds given to the workers to start before the timed run begins
+START_DELAY = 2
+
+
+def init_process(path, tuned):
+    """
+    Point the worker's default database at ``path``; untuned workers run
+    without PRAGMAs and with SQLite's default (deferred) transactions
+    """
+    import django
+    from django.conf import settings
+
+    database = {**settings.DATABASES['default'], 'NAME': path}
+    if not tuned:
+        database['OPTIONS'] = {}
+        settings.SQLITE_PRAGMAS = {}
+    settings.DATABASES = {'default': database}
+    settings.READ_REPLICA_DATABASE = None
+    django.setup()
+
+
+def _read():
+    from apps.content.models import Gallery
+    from apps.events.models import Event
+
+    list(Gallery.objects.order_by('-uploaded_at')[:20])
+    list(Event.objects.filter(is_published=True).order_by('-date')[:20])
+
+
+def _write(user_id):
+    from django.db import transaction
+    from django.utils import timezone
+
+    from apps.contact.models import ContactMessage
+    from apps.users.models import User
+
+    ContactMessage.objects.create(name='Benchmark', email='benchmark@example.com', message='Load test')
+    if user_id is not None:
+        # Read, then write: fails to upgrade its lock without BEGIN IMMEDIATE
+        with transaction.atomic():
+            user = User.objects.get(pk=user_id)
+            user.last_login = timezone.now()
+            user.save(update_fields=['last_login'])
+
+
+def run_worker(role, start, duration, user_id):
+    """Repeat ``role`` ('read' or 'write') for ``duration`` seconds; returns (latencies, lock errors)"""
+    from django.db import OperationalError, connections
+
+    latencies, errors = [], 0
+    time.sleep(max(0, start - time.time()))
+    while time.time() < start + duration:
+        began = time.perf_counter()
+        try:
+            _read() if role == 'read' else _write(user_id)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    connections.close_all()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent reader and writer processes against copies of the "
+        "SQLite database, untuned (rollback journal, no PRAGMAs, deferred "
+        "transactions) and with the current settings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help="Reader processes")
+        parser.add_argument('--writers', type=int, default=4, help="Writer processes")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds to run each configuration")
+
+    def handle(self, *args, readers, writers, duration, **options):
+        database = settings.DATABASES['default']
+        if database['ENGINE'].rsplit('.', 1)[-1] != 'sqlite3':
+            raise CommandError("The default database is not SQLite")
+        from apps.users.models import User
+        user_id = User.objects.order_by('pk').values_list('pk', flat=True).first()
+
+        with tempfile.TemporaryDirectory() as directory:
+            for label, tuned in (('untuned', False), ('tuned', True)):
+                # A copy, so the benchmark's writes never reach the real database
+                path = os.path.join(directory, f'{label}.sqlite3')
+                source = sqlite3.connect(f'file:{database["NAME"]}?mode=ro', uri=True)
+                copy = sqlite3.connect(path)
+                source.backup(copy)
+                # Tuned workers switch their copy back to WAL as they connect
+                copy.execute('PRAGMA journal_mode = delete')
+                source.close()
+                copy.close()
+                self.report(label, self.run(path, tuned, readers, writers, duration, user_id), duration)
+
+    def run(self, path, tuned, readers, writers, duration, user_id):
+        roles = ['read'] * readers + ['write'] * writers
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(len(roles), mp_context=context, initializer=init_process,
+                                 initargs=(path, tuned)) as pool:
+            start = time.time() + START_DELAY
+            futures = [pool.submit(run_worker, role, start, duration, user_id) for role in roles]
+            results = [future.result() for future in futures]
+        return {
+            role: (
+                sorted(latency for (latencies, _), r in zip(results, roles) if r == role for latency in latencies),
+                sum(errors for (_, errors), r in zip(results, roles) if r == role),
+            )
+            for role in ('read', 'write')
+        }
+
+    def report(self, label, results, duration):
+        for role, (latencies, errors) in results.items():
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0
+            self.stdout.write(
+                f"{label:8} {role:5} {len(latencies) / duration:7.1f}/s  p99 {p99:7.1f} ms  "
+                f"{errors} \"database is locked\" errors"
+            )
@@ -0,0 +1,255 @@
+"""
+Media file serving for MEDIA_URL
+
+Files are streamed with FileResponse, which lets WSGI servers use
+``wsgi.file_wrapper`` (sendfile) for zero-copy transfers. Conditional
+requests (If-None-Match / If-Modified-Since) and single byte ranges are
+handled here. Content-addressed originals (core.storage) never change, so
+they are served with an immutable, year-long Cache-Control; derivatives
+are rewritten under the same name when regenerated, so they are not.
+
+When a web server fronts Django, MEDIA_SERVE['ACCEL_REDIRECT'] (nginx) or
+MEDIA_SERVE['SENDFILE'] (Apache/lighttpd) hands the transfer over to it
+once the request has been checked.
+
+MediaURLBuilder turns storage names into absolute URLs. It works out the
+origin once per request (or takes it from MEDIA_BASE_URL, e.g. a CDN) and
+can sign URLs so that only links handed out by the API are served.
+"""
+import mimetypes
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from core.storage import PREFIX, is_immutable
+
+MEDIA_SETTINGS = getattr(settings, 'MEDIA_SERVE', {})
+SIGNED_URLS = MEDIA_SETTINGS.get('SIGNED_URLS', False)
+SIGNATURE_MAX_AGE = MEDIA_SETTINGS.get('SIGNATURE_MAX_AGE', 3600)
+
+# Request attribute holding the request's MediaURLBuilder
+URL_BUILDER_ATTR = '_media_url_builder'
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Directories under MEDIA_ROOT that are never served (partial uploads)
+PRIVATE_PREFIXES = ('uploads/',)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def signature(name, expires):
+    return salted_hmac('core.media', f'{name}:{expires}').hexdigest()[:32]
+
+
+def signature_expiry(now=None):
+    """
+    Expiry for URLs signed at ``now``: the end of the next SIGNATURE_MAX_AGE
+    period, so links stay identical (and cacheable) within a period
+    """
+    now = int(time.time() if now is None else now)
+    return (now // SIGNATURE_MAX_AGE + 2) * SIGNATURE_MAX_AGE
+
+
+def check_signature(request, name):
+    expires = request.GET.get('expires', '')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return constant_time_compare(request.GET.get('signature', ''), signature(name, int(expires)))
+
+
+class MediaURLBuilder:
+    """
+    Absolute URLs for stored files, for the life of one request.
+
+    Files in the local media storage are joined onto a base URL worked out
+    once, instead of going through ``storage.url`` and
+    ``request.build_absolute_uri`` for every file. Other storages (e.g. S3)
+    build their own URLs.
+    """
+
+    def __init__(self, request=None):
+        base_url = getattr(settings, 'MEDIA_BASE_URL', None) or settings.MEDIA_URL
+        if request is not None:
+            base_url = request.build_absolute_uri(base_url)
+        self.request = request
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.expires = signature_expiry() if SIGNED_URLS else None
+        self._local = {}
+
+    def _is_local(self, storage):
+        key = id(storage)
+        if key not in self._local:
+            self._local[key] = (
+                isinstance(storage, FileSystemStorage)
+                and os.path.abspath(storage.location) == os.path.abspath(settings.MEDIA_ROOT)
+                and storage.base_url == settings.MEDIA_URL
+            )
+        return self._local[key]
+
+    def url(self, name, storage):
+        if not self._is_local(storage):
+            url = storage.url(name)
+            return self.request.build_absolute_uri(url) if self.request is not None else url
+        url = self.base_url + filepath_to_uri(name)
+        if self.expires is not None:
+            url += f'?expires={self.expires}&signature={signature(name, self.expires)}'
+        return url
+
+
+def get_url_builder(request):
+    builder = getattr(request, URL_BUILDER_ATTR, None)
+    if builder is None:
+        builder = MediaURLBuilder(request)
+        setattr(request, URL_BUILDER_ATTR, builder)
+    return builder
+
+
+class RangeReader:
+    """File wrapper that reads at most ``length`` bytes from the current position"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def get_etag(name, stat):
+    # Content-addressed originals carry their digest in the name
+    if is_immutable(name):
+        stem = os.path.basename(os.path.splitext(name)[0])
+        return f'"{os.path.dirname(name)[len(PREFIX) + 1:]}{stem}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single-range header, None to
+    serve the whole file, or raise ValueError when it is unsatisfiable
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        # Malformed or multiple ranges: ignored, as RFC 9110 allows
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def set_cache_headers(response, name, etag, stat):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if is_immutable(name):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = f"public, max-age={MEDIA_SETTINGS.get('MAX_AGE', 3600)}"
+
+
+def media_name(path):
+    """
+    Return the absolute path and normalized storage name for a requested
+    ``path``, so that ``.`` and ``..`` segments cannot dodge the checks
+    made on the name
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path.replace('\\', '/'))
+    except SuspiciousFileOperation:
+        raise Http404
+    return full_path, os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+
+
+@require_safe
+def serve_media(request, path):
+    full_path, name = media_name(path)
+    if name.startswith(PRIVATE_PREFIXES):
+        raise Http404
+    if SIGNED_URLS and not check_signature(request, name):
+        return HttpResponseForbidden()
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = get_etag(name, stat)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        set_cache_headers(not_modified, name, etag, stat)
+        return not_modified
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    # Delegate the transfer (including ranges) to the fronting web server
+    if MEDIA_SETTINGS.get('ACCEL_REDIRECT'):
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = MEDIA_SETTINGS['ACCEL_REDIRECT'].rstrip('/') + '/' + name
+        set_cache_headers(response, name, etag, stat)
+        return response
+    if MEDIA_SETTINGS.get('SENDFILE'):
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        set_cache_headers(response, name, etag, stat)
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+    elif byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        f = open(full_path, 'rb')
+        f.seek(start)
+        # Open-ended ranges keep the real file so sendfile still applies
+        body = f if end == size - 1 else RangeReader(f, length)
+        response = FileResponse(body, content_type=content_type, status=206)
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    set_cache_headers(response, name, etag, stat)
+    return response
@@ -0,0 +1,57 @@
+"""
+Request instrumentation for database connection setup
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from core.database import connection_setups
+
+TIMING_SETTINGS = getattr(settings, 'DATABASE_CONNECTION_TIMING', {})
+
+
+class ConnectionTimingMiddleware:
+    """
+    Collect the database connections opened while handling each request
+    (see core.database.TimedConnectMixin) and report the time spent opening
+    them in a Server-Timing header, which browsers show next to the request.
+    Requests served entirely over persistent or pooled connections report
+    nothing.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = TIMING_SETTINGS.get('HEADER', settings.DEBUG)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        setups = []
+        token = connection_setups.set(setups)
+        try:
+            response = self.get_response(request)
+        finally:
+            connection_setups.reset(token)
+        return self.report(response, setups)
+
+    async def __acall__(self, request):
+        setups = []
+        token = connection_setups.set(setups)
+        try:
+            response = await self.get_response(request)
+        finally:
+            connection_setups.reset(token)
+        return self.report(response, setups)
+
+    def report(self, response, setups):
+        if setups and self.header:
+            duration = sum(seconds for _, seconds in setups) * 1000
+            aliases = ','.join(sorted({alias for alias, _ in setups}))
+            entry = f'db-connect;dur={duration:.2f};desc="{len(setups)} ({aliases})"'
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {entry}' if existing else entry
+        return response
@@ -0,0 +1,150 @@
+"""
+Queryset planning from the GraphQL selection set
+
+Looks at the fields a client actually requested and applies
+``select_related``, ``prefetch_related`` and ``only`` so list resolvers load
+exactly the rows and columns the response needs.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.relay import Connection
+from graphene.utils.str_converters import to_snake_case
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode, get_named_type, is_abstract_type
+
+
+class QueryPlan:
+    """The related lookups and columns needed for one selection set"""
+
+    def __init__(self):
+        self.only = set()
+        self.select_related = []
+        self.prefetch_related = []
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def _applies(info, fragment, graphql_type):
+    """Whether ``fragment``'s type condition matches objects of ``graphql_type``"""
+    condition = fragment.type_condition
+    if graphql_type is None or condition is None or condition.name.value == graphql_type.name:
+        return True
+    abstract_type = info.schema.get_type(condition.name.value)
+    return is_abstract_type(abstract_type) and info.schema.is_sub_type(abstract_type, graphql_type)
+
+
+def _collect_fields(info, nodes, fields=None, graphql_type=None):
+    """
+    Group the FieldNodes selected under ``nodes`` by response field name,
+    skipping fragments on types other than ``graphql_type`` when given
+    """
+    if fields is None:
+        fields = {}
+    for node in nodes:
+        selection_set = node.selection_set
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                if _applies(info, selection, graphql_type):
+                    _collect_fields(info, [selection], fields, graphql_type)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment is not None and _applies(info, fragment, graphql_type):
+                    _collect_fields(info, [fragment], fields, graphql_type)
+    return fields
+
+
+def _concrete_field_names(model):
+    return {field.name for field in model._meta.concrete_fields}
+
+
+def _plan(info, model, graphql_type, nodes, plan, prefix=''):
+    """Add the lookups needed by ``nodes`` on ``model`` to ``plan``"""
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    hints = getattr(graphene_type, 'optimizer_hints', {})
+    columns = {model._meta.pk.name}
+    prunable = True
+
+    for name, field_nodes in _collect_fields(info, nodes, graphql_type=graphql_type).items():
+        if name == '__typename':
+            continue
+        attname = to_snake_case(name)
+        if attname in hints:
+            columns.update(hints[attname])
+            continue
+        try:
+            field = model._meta.get_field(attname)
+        except FieldDoesNotExist:
+            # Computed field with unknown dependencies: load every column
+            prunable = False
+            continue
+
+        child_type = get_named_type(graphql_type.fields[name].type)
+        if field.many_to_one or (field.one_to_one and field.concrete):
+            columns.add(attname)
+            plan.select_related.append(prefix + attname)
+            _plan(info, field.related_model, child_type, field_nodes, plan, f'{prefix}{attname}__')
+        elif field.one_to_many or field.many_to_many or field.one_to_one:
+            child_plan = QueryPlan()
+            _plan(info, field.related_model, child_type, field_nodes, child_plan)
+            if field.one_to_many and child_plan.only:
+                # The prefetch join needs the foreign key back to this model
+                child_plan.only.add(field.field.name)
+            plan.prefetch_related.append(
+                Prefetch(prefix + attname, queryset=child_plan.apply(field.related_model._default_manager.all()))
+            )
+        else:
+            columns.add(attname)
+
+    if not prunable:
+        columns = _concrete_field_names(model)
+    plan.only.update(prefix + column for column in columns)
+
+
+def optimize(queryset, info, extra_fields=()):
+    """
+    Return ``queryset`` with related loading and column pruning planned from
+    the selection set of the field being resolved.
+
+    Connection fields are followed through ``edges { node }``. Columns in
+    ``extra_fields`` are always loaded (e.g. the ordering key that keyset
+    pagination reads to build cursors).
+    """
+    graphql_type = get_named_type(info.return_type)
+    nodes = info.field_nodes
+
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    if isinstance(graphene_type, type) and issubclass(graphene_type, Connection):
+        for name in ('edges', 'node'):
+            nodes = _collect_fields(info, nodes).get(name, [])
+            graphql_type = get_named_type(graphql_type.fields[name].type)
+
+    plan = QueryPlan()
+    _plan(info, queryset.model, graphql_type, nodes, plan)
+    plan.only.update(extra_fields)
+    return plan.apply(queryset)
+
+
+def optimize_nested(queryset, info, path, graphene_type):
+    """
+    Like ``optimize``, for the objects of ``graphene_type`` found by
+    following the field names in ``path`` from the field being resolved,
+    e.g. the members of a union nested in a connection's nodes.
+    """
+    graphql_type = get_named_type(info.return_type)
+    nodes = info.field_nodes
+    for name in path:
+        nodes = _collect_fields(info, nodes).get(name, [])
+        graphql_type = get_named_type(graphql_type.fields[name].type)
+    plan = QueryPlan()
+    _plan(info, queryset.model, info.schema.get_type(graphene_type._meta.name), nodes, plan)
+    return plan.apply(queryset)
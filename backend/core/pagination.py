@@ -0,0 +1,143 @@
+"""
+Keyset (cursor) pagination for Relay-style connection fields
+"""
+import base64
+import json
+
+from django.db.models import Q
+from graphene.relay import PageInfo
+from graphene_django.settings import graphene_settings
+from graphql_relay import cursor_to_offset, offset_to_cursor
+
+
+def encode_cursor(obj, field):
+    value = field.value_to_string(obj)
+    raw = json.dumps([value, obj.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, field):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return field.to_python(value), pk
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _seek(name, value, pk, descending):
+    """Rows strictly after (value, pk) when ordered by (name, pk)"""
+    lookup = 'lt' if descending else 'gt'
+    after = Q(**{f'{name}__{lookup}': value}) | Q(**{name: value, f'pk__{lookup}': pk})
+    # The redundant bound lets the database seek the (name, pk) index,
+    # which it cannot do from the OR alone
+    return Q(**{f'{name}__{lookup}e': value}) & after
+
+
+def _check_limit(argument, count, max_limit):
+    if count is None:
+        return
+    if count < 0:
+        raise ValueError(f"Argument '{argument}' must be a non-negative integer.")
+    if count > max_limit:
+        raise ValueError(
+            f"Requesting {count} records on the connection exceeds the "
+            f"'{argument}' limit of {max_limit} records."
+        )
+
+
+def paginate_keyset(connection_type, queryset, ordering, first=None, after=None, last=None, before=None):
+    """
+    Slice ``queryset`` into a ``connection_type`` page ordered by ``ordering``.
+
+    ``ordering`` is a single field name, optionally prefixed with ``-``; the
+    primary key is used as a tie-breaker. Cursors carry the ordering value
+    and pk of a row, so each page is a range seek on (field, pk) instead of
+    an OFFSET scan.
+    """
+    max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+    _check_limit('first', first, max_limit)
+    _check_limit('last', last, max_limit)
+    if first is None and last is None:
+        first = max_limit
+
+    descending = ordering.startswith('-')
+    name = ordering.lstrip('-')
+    field = queryset.model._meta.get_field(name)
+    pk_ordering = '-pk' if descending else 'pk'
+
+    if after:
+        value, pk = decode_cursor(after, field)
+        queryset = queryset.filter(_seek(name, value, pk, descending))
+    if before:
+        value, pk = decode_cursor(before, field)
+        queryset = queryset.filter(_seek(name, value, pk, not descending))
+
+    has_next_page = False
+    has_previous_page = False
+    if first is not None:
+        items = list(queryset.order_by(ordering, pk_ordering)[:first + 1])
+        has_next_page = len(items) > first
+        items = items[:first]
+        if last is not None:
+            has_previous_page = len(items) > last
+            items = items[len(items) - last:] if last else []
+        else:
+            has_previous_page = bool(after)
+    else:
+        reverse = (name, 'pk') if descending else (f'-{name}', '-pk')
+        items = list(queryset.order_by(*reverse)[:last + 1])
+        has_previous_page = len(items) > last
+        items = items[:last][::-1]
+        has_next_page = bool(before)
+
+    edges = [
+        connection_type.Edge(node=obj, cursor=encode_cursor(obj, field))
+        for obj in items
+    ]
+    return connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
+
+
+def paginate_offset(connection_type, fetch, first=None, after=None):
+    """
+    Slice results with no key to seek on (e.g. search hits in rank order)
+    into a ``connection_type`` page.
+
+    ``fetch(limit, offset)`` returns up to ``limit`` nodes starting at
+    ``offset``; None entries (rows that have gone away) are skipped but
+    keep their place, so cursors, which carry offsets, stay valid.
+    """
+    max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+    _check_limit('first', first, max_limit)
+    if first is None:
+        first = max_limit
+
+    offset = 0
+    if after:
+        position = cursor_to_offset(after)
+        if position is None or position < 0:
+            raise ValueError(f"Invalid cursor: {after}")
+        offset = position + 1
+
+    items = fetch(first + 1, offset) if first else []
+    page = items[:first]
+    edges = [
+        connection_type.Edge(node=node, cursor=offset_to_cursor(offset + index))
+        for index, node in enumerate(page) if node is not None
+    ]
+    return connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=offset_to_cursor(offset) if page else None,
+            end_cursor=offset_to_cursor(offset + len(page) - 1) if page else None,
+            has_previous_page=bool(after),
+            has_next_page=len(items) > first,
+        ),
+    )
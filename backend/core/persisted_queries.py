@@ -0,0 +1,108 @@
+"""
+Automatic persisted queries (APQ) for the GraphQL endpoint
+
+Clients send ``extensions.persistedQuery.sha256Hash`` instead of the query
+text. Query texts are registered on first use (hash + query) in the Django
+cache, or come from a manifest of known operations when the allow-list is
+enabled. The resolved text then goes through the shared document cache
+(core.document_cache), so a persisted operation is parsed and validated
+once per process.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from graphene_django.views import HttpError
+
+APQ_SETTINGS = getattr(settings, 'GRAPHQL_PERSISTED_QUERIES', {})
+
+
+class PersistedQueryError(HttpError):
+    """An APQ protocol error, reported to the client with an error code"""
+
+    def __init__(self, code, message):
+        self.code = code
+        super().__init__(HttpResponse(status=200), message)
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def load_manifest(path):
+    """
+    Read an allow-list manifest, either Apollo's
+    ``{"operations": [{"id": ..., "body": ...}]}`` format or a plain
+    ``{"<sha256>": "<query>"}`` mapping
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    if 'operations' in manifest:
+        return {operation['id']: operation['body'] for operation in manifest['operations']}
+    return dict(manifest)
+
+
+class PersistedQueryStore:
+    def __init__(self, cache_alias='default', allow_list_only=False, manifest=None):
+        self.cache_alias = cache_alias
+        self.allow_list_only = allow_list_only
+        self.allow_list = load_manifest(manifest) if manifest else {}
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, sha256):
+        return f'graphql:apq:{sha256}'
+
+    def lookup(self, sha256):
+        query = self.allow_list.get(sha256)
+        if query is None and not self.allow_list_only:
+            query = self.cache.get(self._key(sha256))
+        return query
+
+    def register(self, sha256, query):
+        if sha256 not in self.allow_list:
+            self.cache.set(self._key(sha256), query, None)
+
+    def resolve(self, query, extensions):
+        """
+        Return the query text for a request. Raises PersistedQueryError on
+        protocol errors or when the allow-list rejects the operation.
+        """
+        persisted = (extensions or {}).get('persistedQuery')
+        if not persisted:
+            if query and self.allow_list_only:
+                sha256 = query_hash(query)
+                if sha256 not in self.allow_list:
+                    raise PersistedQueryError('PERSISTED_QUERY_NOT_ALLOWED', 'PersistedQueryNotAllowed')
+            return query
+
+        if persisted.get('version', 1) != 1:
+            raise PersistedQueryError('PERSISTED_QUERY_VERSION_NOT_SUPPORTED', 'Unsupported persisted query version')
+        sha256 = persisted.get('sha256Hash')
+        if not sha256:
+            raise PersistedQueryError('PERSISTED_QUERY_HASH_REQUIRED', 'Persisted query hash is required')
+
+        if query:
+            if query_hash(query) != sha256:
+                raise PersistedQueryError('PERSISTED_QUERY_HASH_MISMATCH', 'provided sha does not match query')
+            if self.allow_list_only and sha256 not in self.allow_list:
+                raise PersistedQueryError('PERSISTED_QUERY_NOT_ALLOWED', 'PersistedQueryNotAllowed')
+            self.register(sha256, query)
+            return query
+
+        query = self.lookup(sha256)
+        if query is None:
+            raise PersistedQueryError('PERSISTED_QUERY_NOT_FOUND', 'PersistedQueryNotFound')
+        return query
+
+
+persisted_queries = PersistedQueryStore(
+    cache_alias=APQ_SETTINGS.get('CACHE_ALIAS', 'default'),
+    allow_list_only=APQ_SETTINGS.get('ALLOW_LIST_ONLY', False),
+    manifest=APQ_SETTINGS.get('MANIFEST'),
+)
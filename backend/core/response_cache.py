@@ -0,0 +1,128 @@
+"""
+Shared cache of rendered responses for public GraphQL queries
+
+Entries are keyed by the normalized query document, variables, operation
+name, auth scope and the base URL of the media links in the response
+(which follows the request's host and scheme). Each public root field
+carries a set of tags; a tag's current version is folded into the key, so
+invalidating a tag (bumping its version) makes every entry that depends on
+it unreachable at once.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode, OperationType, get_operation_ast
+
+# Public root fields and the content they read
+PUBLIC_QUERY_TAGS = {
+    'news': {'news', 'users'},
+    'newsConnection': {'news', 'users'},
+    'newsArticle': {'news', 'users'},
+    'events': {'events'},
+    'eventsConnection': {'events'},
+    'event': {'events'},
+    'dojoLocations': {'dojo_locations', 'instructors'},
+    'dojoLocation': {'dojo_locations', 'instructors'},
+    'galleryItems': {'gallery'},
+    'galleryItemsConnection': {'gallery'},
+    'instructors': {'instructors', 'dojo_locations'},
+    'instructor': {'instructors', 'dojo_locations'},
+    'karateAdventures': {'karate_adventures'},
+    'karateAdventuresConnection': {'karate_adventures'},
+    'search': {'news', 'users', 'events', 'karate_adventures', 'instructors', 'dojo_locations'},
+    '__typename': set(),
+}
+
+CACHE_SETTINGS = getattr(settings, 'GRAPHQL_RESPONSE_CACHE', {})
+
+
+def get_cache():
+    return caches[CACHE_SETTINGS.get('CACHE_ALIAS', 'default')]
+
+
+def _tag_key(tag):
+    return f'graphql:tag:{tag}'
+
+
+def _root_fields(document, selection_set, fields):
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.add(selection.name.value)
+        elif isinstance(selection, InlineFragmentNode):
+            _root_fields(document, selection.selection_set, fields)
+        elif isinstance(selection, FragmentSpreadNode):
+            for definition in document.definitions:
+                if getattr(definition, 'name', None) and definition.name.value == selection.name.value:
+                    _root_fields(document, definition.selection_set, fields)
+    return fields
+
+
+def get_tags(document, operation_name):
+    """
+    Return the tags a query operation depends on, or None if it must not be
+    cached (mutations, or any root field outside PUBLIC_QUERY_TAGS)
+    """
+    operation = get_operation_ast(document, operation_name)
+    if operation is None or operation.operation != OperationType.QUERY:
+        return None
+    tags = set()
+    for field in _root_fields(document, operation.selection_set, set()):
+        if field not in PUBLIC_QUERY_TAGS:
+            return None
+        tags |= PUBLIC_QUERY_TAGS[field]
+    return tags
+
+
+def get_cache_key(normalized_query, variables, operation_name, scope, tags, base_url=None):
+    """
+    Build the cache key for a response, folding in the tags' versions;
+    ``base_url`` is the media URL prefix the response's links are built on,
+    which differs by host and scheme
+    """
+    cache = get_cache()
+    tag_keys = sorted(_tag_key(tag) for tag in tags)
+    versions = cache.get_many(tag_keys)
+    missing = [key for key in tag_keys if key not in versions]
+    if missing:
+        # Start unseen (or evicted) tags at a fresh version so entries
+        # written before an eviction can never match again
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions = cache.get_many(tag_keys)
+    raw = json.dumps(
+        [
+            normalized_query,
+            variables or {},
+            operation_name,
+            scope,
+            base_url,
+            [versions.get(key) for key in tag_keys],
+        ],
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str,
+    )
+    return 'graphql:response:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get_scope(request):
+    user = request.user
+    if user.is_authenticated:
+        return f'user:{user.pk}'
+    return 'anonymous'
+
+
+def get_response(key):
+    return get_cache().get(key)
+
+
+def set_response(key, value):
+    get_cache().set(key, value, CACHE_SETTINGS.get('TIMEOUT', 300))
+
+
+def invalidate_tags(*tags):
+    """Expire every cached response that depends on any of ``tags``"""
+    get_cache().set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
@@ -5,11 +5,24 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
 from django.utils import timezone
 from apps.news.models import News
 from apps.events.models import Event, EventRegistration
+from apps.events.registration import cancel as cancel_registration, promote_waitlist, register
 from apps.contact.models import ContactMessage
+from apps.content.gallery_import import create_gallery_items, store_gallery_image
 from apps.content.models import DojoLocation as DojoLocationModel, Gallery as GalleryModel, Instructor as InstructorModel, KarateAdventure as KarateAdventureModel
+from apps.uploads import chunked
+from apps.search.index import load_objects, search
+from apps.uploads.models import ChunkedUpload
+from core.dataloaders import load_foreign_key, load_reverse, mark_siblings
+from core.images import image_name, image_srcset
+from core.media import get_url_builder
+from core.optimizer import optimize, optimize_nested
+from core.pagination import paginate_keyset, paginate_offset
+from core.response_cache import invalidate_tags
 import graphql_jwt
 from graphene_file_upload.scalars import Upload
 import uuid
@@ -17,6 +30,47 @@ import uuid
 User = get_user_model()
 
 
+class ImageFormat(graphene.Enum):
+    ORIGINAL = 'original'
+    WEBP = 'webp'
+    AVIF = 'avif'
+
+
+def image_url_field():
+    return graphene.String(width=graphene.Int(), format=ImageFormat())
+
+
+def image_srcset_field():
+    return graphene.String(format=ImageFormat())
+
+
+class ImageMetadata(graphene.ObjectType):
+    """Layout hints computed when an image is processed"""
+    width = graphene.Int()
+    height = graphene.Int()
+    dominant_color = graphene.String(description="Hex color, e.g. #aabbcc")
+    placeholder = graphene.String(description="Tiny blurred preview as a data URI")
+
+
+def image_optimizer_hints(field_name):
+    """Columns behind the URL fields of an image; the metadata saves storage lookups"""
+    columns = [field_name, f'{field_name}_metadata']
+    return {field_name: columns, f'{field_name}_srcset': columns}
+
+
+def resolve_image_url(info, fieldfile, width=None, format=None, metadata=None):
+    name = image_name(fieldfile, width, getattr(format, 'value', format), metadata)
+    if name is None:
+        return None
+    return get_url_builder(info.context).url(name, fieldfile.storage)
+
+
+def resolve_image_srcset(info, fieldfile, format=None, metadata=None):
+    builder = get_url_builder(info.context)
+    candidates = image_srcset(fieldfile, getattr(format, 'value', format), metadata)
+    return ', '.join(f'{builder.url(name, fieldfile.storage)} {width}w' for name, width in candidates) or None
+
+
 # Object Types
 class UserType(DjangoObjectType):
     class Meta:
@@ -25,34 +79,49 @@ class UserType(DjangoObjectType):
 
 
 class NewsType(DjangoObjectType):
-    cover_image = graphene.String()
+    cover_image = image_url_field()
+    cover_image_srcset = image_srcset_field()
+    cover_image_metadata = graphene.Field(ImageMetadata)
+    optimizer_hints = image_optimizer_hints('cover_image')
     class Meta:
         model = News
         fields = ('id', 'title', 'content', 'cover_image', 'author', 'published_at', 'updated_at', 'is_published')
 
-    def resolve_cover_image(self, info):
-        if self.cover_image:
-            request = info.context
-            return request.build_absolute_uri(self.cover_image.url)
-        return None
+    def resolve_cover_image(self, info, width=None, format=None):
+        return resolve_image_url(info, self.cover_image, width, format, self.cover_image_metadata)
+
+    def resolve_cover_image_srcset(self, info, format=None):
+        return resolve_image_srcset(info, self.cover_image, format, self.cover_image_metadata)
+
+    def resolve_author(self, info):
+        return load_foreign_key(info, self, 'author', 'users_by_id')
 
 class EventType(DjangoObjectType):
-    cover_image = graphene.String()
+    cover_image = image_url_field()
+    cover_image_srcset = image_srcset_field()
+    cover_image_metadata = graphene.Field(ImageMetadata)
+    optimizer_hints = image_optimizer_hints('cover_image')
     class Meta:
         model = Event
         fields = ('id', 'title', 'description', 'date', 'location', 'cover_image', 'fee', 'max_participants', 
-                 'current_registrations', 'created_at', 'updated_at', 'is_published')
+                 'current_registrations', 'waitlist_count', 'created_at', 'updated_at', 'is_published')
 
-    def resolve_cover_image(self, info):
-        if self.cover_image:
-            request = info.context
-            return request.build_absolute_uri(self.cover_image.url)
-        return None
+    def resolve_cover_image(self, info, width=None, format=None):
+        return resolve_image_url(info, self.cover_image, width, format, self.cover_image_metadata)
+
+    def resolve_cover_image_srcset(self, info, format=None):
+        return resolve_image_srcset(info, self.cover_image, format, self.cover_image_metadata)
 
 class EventRegistrationType(DjangoObjectType):
     class Meta:
         model = EventRegistration
-        fields = ('id', 'event', 'user', 'status', 'additional_notes', 'created_at', 'updated_at')
+        fields = ('id', 'event', 'user', 'status', 'waitlist_position', 'additional_notes', 'created_at', 'updated_at')
+
+    def resolve_event(self, info):
+        return load_foreign_key(info, self, 'event', 'events_by_id')
+
+    def resolve_user(self, info):
+        return load_foreign_key(info, self, 'user', 'users_by_id')
 
 
 class ContactMessageType(DjangoObjectType):
@@ -63,80 +132,200 @@ class ContactMessageType(DjangoObjectType):
 
 # New Content Types
 class DojoLocationType(DjangoObjectType):
-    cover_image = graphene.String()
+    cover_image = image_url_field()
+    cover_image_srcset = image_srcset_field()
+    cover_image_metadata = graphene.Field(ImageMetadata)
+    optimizer_hints = image_optimizer_hints('cover_image')
     instructors = graphene.List(lambda: InstructorType)
     class Meta:
         model = DojoLocationModel
         fields = ('id', 'name', 'address', 'city', 'country', 'map_link', 'description', 'cover_image')
 
-    def resolve_cover_image(self, info):
-        if self.cover_image:
-            request = info.context
-            return request.build_absolute_uri(self.cover_image.url)
-        return None
+    def resolve_cover_image(self, info, width=None, format=None):
+        return resolve_image_url(info, self.cover_image, width, format, self.cover_image_metadata)
+
+    def resolve_cover_image_srcset(self, info, format=None):
+        return resolve_image_srcset(info, self.cover_image, format, self.cover_image_metadata)
 
     def resolve_instructors(self, info):
-        return self.instructors.all()
+        return load_reverse(info, self, 'instructors', 'instructors_by_dojo_location')
 
 
 class GalleryType(DjangoObjectType):
-    image = graphene.String()
+    image = image_url_field()
+    image_srcset = image_srcset_field()
+    image_metadata = graphene.Field(ImageMetadata)
+    optimizer_hints = image_optimizer_hints('image')
     class Meta:
         model = GalleryModel
         fields = ('id', 'title', 'image', 'description', 'uploaded_at')
 
-    def resolve_image(self, info):
-        if self.image:
-            request = info.context
-            return request.build_absolute_uri(self.image.url)
-        return None
+    def resolve_image(self, info, width=None, format=None):
+        return resolve_image_url(info, self.image, width, format, self.image_metadata)
+
+    def resolve_image_srcset(self, info, format=None):
+        return resolve_image_srcset(info, self.image, format, self.image_metadata)
 
 
 class InstructorType(DjangoObjectType):
+    photo = image_url_field()
+    photo_srcset = image_srcset_field()
+    photo_metadata = graphene.Field(ImageMetadata)
+    optimizer_hints = image_optimizer_hints('photo')
     class Meta:
         model = InstructorModel
         fields = ('id', 'name', 'rank', 'bio', 'photo', 'dojo_location')
 
+    def resolve_photo(self, info, width=None, format=None):
+        return resolve_image_url(info, self.photo, width, format, self.photo_metadata)
+
+    def resolve_photo_srcset(self, info, format=None):
+        return resolve_image_srcset(info, self.photo, format, self.photo_metadata)
+
+    def resolve_dojo_location(self, info):
+        return load_foreign_key(info, self, 'dojo_location', 'dojo_locations_by_id')
+
 class KarateAdventureType(DjangoObjectType):
-    cover_image = graphene.String()
+    cover_image = image_url_field()
+    cover_image_srcset = image_srcset_field()
+    cover_image_metadata = graphene.Field(ImageMetadata)
+    optimizer_hints = image_optimizer_hints('cover_image')
     class Meta:
         model = KarateAdventureModel
         fields = ('id', 'title', 'description', 'start_date', 'end_date', 'location', 'cover_image')
 
-    def resolve_cover_image(self, info):
-        if self.cover_image:
-            request = info.context
-            return request.build_absolute_uri(self.cover_image.url)
-        return None
+    def resolve_cover_image(self, info, width=None, format=None):
+        return resolve_image_url(info, self.cover_image, width, format, self.cover_image_metadata)
+
+    def resolve_cover_image_srcset(self, info, format=None):
+        return resolve_image_srcset(info, self.cover_image, format, self.cover_image_metadata)
+
+class ChunkedUploadType(DjangoObjectType):
+    upload_url = graphene.String()
+    max_chunk_size = graphene.Int()
+    optimizer_hints = {'upload_url': [], 'max_chunk_size': []}
+    class Meta:
+        model = ChunkedUpload
+        fields = ('id', 'filename', 'content_type', 'size', 'received', 'status', 'created_at')
+
+    def resolve_upload_url(self, info):
+        return info.context.build_absolute_uri(reverse('upload-chunk', args=[self.pk]))
+
+    def resolve_max_chunk_size(self, info):
+        return chunked.MAX_CHUNK_SIZE
+
+# Search results
+class SearchType(graphene.Enum):
+    NEWS = 'news.news'
+    EVENT = 'events.event'
+    KARATE_ADVENTURE = 'content.karateadventure'
+    INSTRUCTOR = 'content.instructor'
+    DOJO_LOCATION = 'content.dojolocation'
+
+
+SEARCH_NODE_TYPES = {
+    'news.news': NewsType,
+    'events.event': EventType,
+    'content.karateadventure': KarateAdventureType,
+    'content.instructor': InstructorType,
+    'content.dojolocation': DojoLocationType,
+}
+
+
+class SearchNode(graphene.Union):
+    class Meta:
+        types = tuple(SEARCH_NODE_TYPES.values())
+
+
+class SearchResultType(graphene.ObjectType):
+    type = graphene.Field(SearchType)
+    rank = graphene.Float(description="Relevance; higher is better")
+    title = graphene.String(description="HTML-escaped title with matches wrapped in <mark>")
+    snippet = graphene.String(description="HTML-escaped excerpt of the text around the matches, marked like title")
+    node = graphene.Field(SearchNode)
+
+# Connections (cursor-paginated lists)
+class UserConnection(graphene.relay.Connection):
+    class Meta:
+        node = UserType
+
+
+class NewsConnection(graphene.relay.Connection):
+    class Meta:
+        node = NewsType
+
+
+class EventConnection(graphene.relay.Connection):
+    class Meta:
+        node = EventType
+
+
+class ContactMessageConnection(graphene.relay.Connection):
+    class Meta:
+        node = ContactMessageType
+
+
+class GalleryConnection(graphene.relay.Connection):
+    class Meta:
+        node = GalleryType
+
+
+class KarateAdventureConnection(graphene.relay.Connection):
+    class Meta:
+        node = KarateAdventureType
+
+
+class SearchConnection(graphene.relay.Connection):
+    class Meta:
+        node = SearchResultType
+
 
 # Queries
 class Query(graphene.ObjectType):
     # User queries
     me = graphene.Field(UserType)
     users = graphene.List(UserType)
+    users_connection = graphene.relay.ConnectionField(UserConnection)
     user = graphene.Field(UserType, id=graphene.ID(required=True))
 
     # News queries
     news = graphene.List(NewsType)
+    news_connection = graphene.relay.ConnectionField(NewsConnection)
     news_article = graphene.Field(NewsType, id=graphene.ID(required=True))
 
     # Event queries
     events = graphene.List(EventType)
+    events_connection = graphene.relay.ConnectionField(EventConnection)
     event = graphene.Field(EventType, id=graphene.ID(required=True))
     my_registrations = graphene.List(EventRegistrationType)
 
     # Contact queries
     contact_messages = graphene.List(ContactMessageType)
+    contact_messages_connection = graphene.relay.ConnectionField(ContactMessageConnection)
 
     # Content queries (public)
     dojo_locations = graphene.List(DojoLocationType)
     dojo_location = graphene.Field(DojoLocationType, id=graphene.ID(required=True))
     gallery_items = graphene.List(GalleryType)
+    gallery_items_connection = graphene.relay.ConnectionField(GalleryConnection)
     instructors = graphene.List(InstructorType)
     instructor = graphene.Field(InstructorType, id=graphene.ID(required=True))
     karate_adventures = graphene.List(KarateAdventureType)
+    karate_adventures_connection = graphene.relay.ConnectionField(KarateAdventureConnection)
     karate_adventure = graphene.Field(KarateAdventureType, id=graphene.ID(required=True))
 
+    # Full-text search (public)
+    search = graphene.Field(
+        SearchConnection,
+        query=graphene.String(required=True),
+        types=graphene.List(graphene.NonNull(SearchType)),
+        first=graphene.Int(),
+        after=graphene.String(),
+    )
+
+    # Chunked uploads (own uploads only)
+    upload = graphene.Field(ChunkedUploadType, id=graphene.ID(required=True))
+
     def resolve_me(self, info):
         user = info.context.user
         if user.is_authenticated:
@@ -146,60 +335,113 @@ class Query(graphene.ObjectType):
     def resolve_users(self, info):
         user = info.context.user
         if user.is_authenticated and user.is_admin:
-            return User.objects.all()
+            return optimize(User.objects.all(), info)
         return None
 
+    def resolve_users_connection(self, info, **kwargs):
+        user = info.context.user
+        if user.is_authenticated and user.is_admin:
+            return paginate_keyset(UserConnection, optimize(User.objects.all(), info, ['created_at']), '-created_at', **kwargs)
+        return []
+
     def resolve_user(self, info, id):
         user = info.context.user
         if user.is_authenticated and user.is_admin:
-            return User.objects.get(id=id)
+            return optimize(User.objects.all(), info).get(id=id)
         return None
 
     def resolve_news(self, info):
-        return News.objects.filter(is_published=True).order_by('-published_at')
+        return optimize(News.objects.filter(is_published=True), info).order_by('-published_at')
+
+    def resolve_news_connection(self, info, **kwargs):
+        return paginate_keyset(NewsConnection, optimize(News.objects.filter(is_published=True), info, ['published_at']), '-published_at', **kwargs)
 
     def resolve_news_article(self, info, id):
-        return News.objects.get(id=id, is_published=True)
+        return optimize(News.objects.all(), info).get(id=id, is_published=True)
 
     def resolve_events(self, info):
-        return Event.objects.filter(is_published=True).order_by('-date')
+        return optimize(Event.objects.filter(is_published=True), info).order_by('-date')
+
+    def resolve_events_connection(self, info, **kwargs):
+        return paginate_keyset(EventConnection, optimize(Event.objects.filter(is_published=True), info, ['date']), '-date', **kwargs)
 
     def resolve_event(self, info, id):
-        return Event.objects.get(id=id, is_published=True)
+        return optimize(Event.objects.all(), info).get(id=id, is_published=True)
 
     def resolve_my_registrations(self, info):
         user = info.context.user
         if user.is_authenticated:
-            return EventRegistration.objects.filter(user=user)
+            return optimize(EventRegistration.objects.filter(user=user), info)
         return None
 
     def resolve_contact_messages(self, info):
         user = info.context.user
         if user.is_authenticated and user.is_admin:
-            return ContactMessage.objects.all()
+            return optimize(ContactMessage.objects.all(), info)
         return None
 
+    def resolve_contact_messages_connection(self, info, **kwargs):
+        user = info.context.user
+        if user.is_authenticated and user.is_admin:
+            return paginate_keyset(ContactMessageConnection, optimize(ContactMessage.objects.all(), info, ['created_at']), '-created_at', **kwargs)
+        return []
+
     # Content resolvers
     def resolve_dojo_locations(self, info):
-        return DojoLocationModel.objects.all()
+        return optimize(DojoLocationModel.objects.all(), info)
 
     def resolve_dojo_location(self, info, id):
-        return DojoLocationModel.objects.get(id=id)
+        return optimize(DojoLocationModel.objects.all(), info).get(id=id)
 
     def resolve_gallery_items(self, info):
-        return GalleryModel.objects.order_by('-uploaded_at')
+        return optimize(GalleryModel.objects.all(), info).order_by('-uploaded_at')
+
+    def resolve_gallery_items_connection(self, info, **kwargs):
+        return paginate_keyset(GalleryConnection, optimize(GalleryModel.objects.all(), info, ['uploaded_at']), '-uploaded_at', **kwargs)
 
     def resolve_instructors(self, info):
-        return InstructorModel.objects.select_related('dojo_location').all()
+        return optimize(InstructorModel.objects.all(), info)
 
     def resolve_instructor(self, info, id):
-        return InstructorModel.objects.get(id=id)
+        return optimize(InstructorModel.objects.all(), info).get(id=id)
 
     def resolve_karate_adventures(self, info):
-        return KarateAdventureModel.objects.order_by('-start_date')
+        return optimize(KarateAdventureModel.objects.all(), info).order_by('-start_date')
+
+    def resolve_karate_adventures_connection(self, info, **kwargs):
+        return paginate_keyset(KarateAdventureConnection, optimize(KarateAdventureModel.objects.all(), info, ['start_date']), '-start_date', **kwargs)
 
     def resolve_karate_adventure(self, info, id):
-        return KarateAdventureModel.objects.get(id=id)
+        return optimize(KarateAdventureModel.objects.all(), info).get(id=id)
+
+    def resolve_search(self, info, query, types=None, first=None, after=None):
+        content_types = [getattr(t, 'value', t) for t in types] if types else None
+
+        def fetch(limit, offset):
+            hits = search(query, content_types, limit, offset)
+            querysets = {
+                label: optimize_nested(node_type._meta.model.objects.all(), info, ('edges', 'node', 'node'), node_type)
+                for label, node_type in SEARCH_NODE_TYPES.items()
+                if any(hit.content_type == label for hit in hits)
+            }
+            objects = load_objects(hits, querysets)
+            for group in objects.values():
+                mark_siblings(list(group.values()))
+            results = []
+            for hit in hits:
+                obj = objects[hit.content_type].get(hit.object_id)
+                results.append(obj and SearchResultType(
+                    type=hit.content_type, rank=hit.rank, title=hit.title, snippet=hit.snippet, node=obj,
+                ))
+            return results
+
+        return paginate_offset(SearchConnection, fetch, first, after)
+
+    def resolve_upload(self, info, id):
+        user = info.context.user
+        if not user.is_authenticated:
+            return None
+        return optimize(ChunkedUpload.objects.filter(created_by=user), info).filter(id=id).first()
 
 
 # Authentication Response Types
@@ -429,9 +671,10 @@ class ChangePassword(graphene.Mutation):
             except ValidationError as e:
                 return ChangePassword(success=False, message=f"Password validation failed: {', '.join(e.messages)}")
 
-            # Set new password
+            # Set new password (only that column: the request's user may be
+            # a cached snapshot)
             user.set_password(new_password)
-            user.save()
+            user.save(update_fields=['password', 'updated_at'])
 
             return ChangePassword(success=True, message="Password changed successfully")
         except Exception as e:
@@ -453,14 +696,15 @@ class UpdateProfile(graphene.Mutation):
             return UpdateProfile(success=False, message="Authentication required")
 
         try:
-            if first_name is not None:
-                user.first_name = first_name
-            if last_name is not None:
-                user.last_name = last_name
-            if phone is not None:
-                user.phone = phone
-            
-            user.save()
+            changes = {'first_name': first_name, 'last_name': last_name, 'phone': phone}
+            changes = {field: value for field, value in changes.items() if value is not None}
+            for field, value in changes.items():
+                setattr(user, field, value)
+
+            # Only the edited columns: the request's user may be a cached
+            # snapshot whose other fields are out of date
+            user.save(update_fields=[*changes, 'updated_at'])
+            invalidate_tags('users')
             return UpdateProfile(success=True, message="Profile updated successfully", user=user)
         except Exception as e:
             return UpdateProfile(success=False, message=str(e))
@@ -526,6 +770,7 @@ class UpdateUser(graphene.Mutation):
                 if value is not None:
                     setattr(target_user, field, value)
             target_user.save()
+            invalidate_tags('users')
             return UpdateUser(user=target_user, success=True, message="User updated successfully")
         except User.DoesNotExist:
             return UpdateUser(success=False, message="User not found")
@@ -548,6 +793,7 @@ class DeleteUser(graphene.Mutation):
         try:
             target_user = User.objects.get(id=id)
             target_user.delete()
+            invalidate_tags('users', 'news')
             return DeleteUser(success=True, message="User deleted successfully")
         except User.DoesNotExist:
             return DeleteUser(success=False, message="User not found")
@@ -561,23 +807,28 @@ class CreateNews(graphene.Mutation):
         content = graphene.String(required=True)
         cover_image = graphene.String()
         cover_image_file = Upload()
+        cover_image_upload_id = graphene.ID()
 
     news = graphene.Field(NewsType)
     success = graphene.Boolean()
     message = graphene.String()
 
-    def mutate(self, info, title, content, cover_image=None, cover_image_file=None):
+    def mutate(self, info, title, content, cover_image=None, cover_image_file=None, cover_image_upload_id=None):
         user = info.context.user
         if not user.is_authenticated or not user.is_admin:
             return CreateNews(success=False, message="Only admins can create news")
 
         try:
-            news = News.objects.create(
-                title=title,
-                content=content,
-                author=user,
-                cover_image=cover_image_file or cover_image
-            )
+            with transaction.atomic():
+                if cover_image_upload_id:
+                    cover_image = chunked.consume(cover_image_upload_id, user)
+                news = News.objects.create(
+                    title=title,
+                    content=content,
+                    author=user,
+                    cover_image=cover_image_file or cover_image
+                )
+            invalidate_tags('news')
             return CreateNews(news=news, success=True, message="News created successfully")
         except Exception as e:
             return CreateNews(success=False, message=str(e))
@@ -609,6 +860,7 @@ class UpdateNews(graphene.Mutation):
             if cover_image_file is not None:
                 news.cover_image = cover_image_file
             news.save()
+            invalidate_tags('news')
             return UpdateNews(news=news, success=True, message="News updated successfully")
         except News.DoesNotExist:
             return UpdateNews(success=False, message="News not found")
@@ -631,6 +883,7 @@ class DeleteNews(graphene.Mutation):
         try:
             news = News.objects.get(id=id)
             news.delete()
+            invalidate_tags('news')
             return DeleteNews(success=True, message="News deleted successfully")
         except News.DoesNotExist:
             return DeleteNews(success=False, message="News not found")
@@ -668,6 +921,7 @@ class CreateEvent(graphene.Mutation):
                 fee=fee,
                 max_participants=max_participants
             )
+            invalidate_tags('events')
             return CreateEvent(event=event, success=True, message="Event created successfully")
         except Exception as e:
             return CreateEvent(success=False, message=str(e))
@@ -702,7 +956,12 @@ class UpdateEvent(graphene.Mutation):
                     setattr(event, field, value)
             if cover_image_file is not None:
                 event.cover_image = cover_image_file
-            event.save()
+            with transaction.atomic():
+                event.save()
+                if kwargs.get('max_participants') is not None:
+                    # Added seats go to the waitlist
+                    promote_waitlist(event.pk)
+            invalidate_tags('events')
             return UpdateEvent(event=event, success=True, message="Event updated successfully")
         except Event.DoesNotExist:
             return UpdateEvent(success=False, message="Event not found")
@@ -725,6 +984,7 @@ class DeleteEvent(graphene.Mutation):
         try:
             event = Event.objects.get(id=id)
             event.delete()
+            invalidate_tags('events')
             return DeleteEvent(success=True, message="Event deleted successfully")
         except Event.DoesNotExist:
             return DeleteEvent(success=False, message="Event not found")
@@ -736,43 +996,96 @@ class RegisterForEvent(graphene.Mutation):
     class Arguments:
         event_id = graphene.ID(required=True)
         additional_notes = graphene.String()
+        join_waitlist = graphene.Boolean(default_value=True)
 
     registration = graphene.Field(EventRegistrationType)
     success = graphene.Boolean()
     message = graphene.String()
 
-    def mutate(self, info, event_id, additional_notes=None):
+    def mutate(self, info, event_id, additional_notes=None, join_waitlist=True):
         user = info.context.user
         if not user.is_authenticated:
             return RegisterForEvent(success=False, message="Authentication required")
 
         try:
-            event = Event.objects.get(id=event_id)
-            
-            # Check if already registered
-            if EventRegistration.objects.filter(event=event, user=user).exists():
-                return RegisterForEvent(success=False, message="Already registered for this event")
-            
-            # Check if event is full
-            if event.max_participants and event.current_registrations >= event.max_participants:
-                return RegisterForEvent(success=False, message="Event is full")
-
-            registration = EventRegistration.objects.create(
-                event=event,
-                user=user,
-                additional_notes=additional_notes or ''
-            )
-            
-            # Update current registrations count
-            event.current_registrations += 1
-            event.save()
-
-            return RegisterForEvent(registration=registration, success=True, message="Successfully registered for event")
-        except Event.DoesNotExist:
-            return RegisterForEvent(success=False, message="Event not found")
+            registration = register(event_id, user, additional_notes or '', join_waitlist)
         except Exception as e:
             return RegisterForEvent(success=False, message=str(e))
 
+        invalidate_tags('events')
+        if registration.status == 'waitlisted':
+            message = f"Event is full; added to the waitlist at position {registration.waitlist_position}"
+        else:
+            message = "Successfully registered for event"
+        return RegisterForEvent(registration=registration, success=True, message=message)
+
+
+class CancelRegistration(graphene.Mutation):
+    class Arguments:
+        event_id = graphene.ID(required=True)
+
+    registration = graphene.Field(EventRegistrationType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, event_id):
+        user = info.context.user
+        if not user.is_authenticated:
+            return CancelRegistration(success=False, message="Authentication required")
+
+        try:
+            registration = cancel_registration(event_id, user)
+        except Exception as e:
+            return CancelRegistration(success=False, message=str(e))
+
+        invalidate_tags('events')
+        return CancelRegistration(registration=registration, success=True, message="Registration cancelled")
+
+
+class InitiateUpload(graphene.Mutation):
+    class Arguments:
+        filename = graphene.String(required=True)
+        content_type = graphene.String(required=True)
+        size = graphene.Int(required=True)
+
+    upload = graphene.Field(ChunkedUploadType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, filename, content_type, size):
+        user = info.context.user
+        if not user.is_authenticated or not user.is_admin:
+            return InitiateUpload(success=False, message="Only admins can upload files")
+
+        try:
+            upload = chunked.initiate(user, filename, content_type, size)
+            return InitiateUpload(upload=upload, success=True, message="Upload initiated")
+        except chunked.UploadError as e:
+            return InitiateUpload(success=False, message=str(e))
+
+
+class FinalizeUpload(graphene.Mutation):
+    class Arguments:
+        id = graphene.ID(required=True)
+
+    upload = graphene.Field(ChunkedUploadType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, id):
+        user = info.context.user
+        if not user.is_authenticated:
+            return FinalizeUpload(success=False, message="Authentication required")
+
+        upload = ChunkedUpload.objects.filter(pk=id, created_by=user).first()
+        if upload is None:
+            return FinalizeUpload(success=False, message="Upload not found")
+        try:
+            upload = chunked.finalize(upload)
+            return FinalizeUpload(upload=upload, success=True, message="Upload complete")
+        except chunked.UploadError as e:
+            return FinalizeUpload(upload=upload, success=False, message=str(e))
+
 
 class CreateContactMessage(graphene.Mutation):
     class Arguments:
@@ -817,6 +1130,7 @@ class CreateDojoLocation(graphene.Mutation):
         if cover_image_file is not None:
             create_data["cover_image"] = cover_image_file
         obj = DojoLocationModel.objects.create(**create_data)
+        invalidate_tags('dojo_locations')
         return CreateDojoLocation(dojo_location=obj)
 
 
@@ -845,6 +1159,7 @@ class UpdateDojoLocation(graphene.Mutation):
         if cover_image_file is not None:
             obj.cover_image = cover_image_file
         obj.save()
+        invalidate_tags('dojo_locations')
         return UpdateDojoLocation(dojo_location=obj)
 
 
@@ -859,6 +1174,7 @@ class DeleteDojoLocation(graphene.Mutation):
         if not user.is_authenticated or not user.is_admin:
             raise Exception("Only admins can delete dojo locations")
         DojoLocationModel.objects.filter(id=id).delete()
+        invalidate_tags('dojo_locations', 'instructors')
         return DeleteDojoLocation(ok=True)
 
 
@@ -867,15 +1183,20 @@ class CreateGalleryItem(graphene.Mutation):
         title = graphene.String(required=True)
         image = graphene.String()
         image_file = Upload()
+        image_upload_id = graphene.ID()
         description = graphene.String()
 
     gallery = graphene.Field(GalleryType)
 
-    def mutate(self, info, title, image=None, image_file=None, description=None):
+    def mutate(self, info, title, image=None, image_file=None, image_upload_id=None, description=None):
         user = info.context.user
         if not user.is_authenticated or not user.is_admin:
             raise Exception("Only admins can create gallery items")
-        obj = GalleryModel.objects.create(title=title, image=image_file or image, description=description or "")
+        with transaction.atomic():
+            if image_upload_id:
+                image = chunked.consume(image_upload_id, user)
+            obj = GalleryModel.objects.create(title=title, image=image_file or image, description=description or "")
+        invalidate_tags('gallery')
         return CreateGalleryItem(gallery=obj)
 
 
@@ -890,9 +1211,64 @@ class DeleteGalleryItem(graphene.Mutation):
         if not user.is_authenticated or not user.is_admin:
             raise Exception("Only admins can delete gallery items")
         GalleryModel.objects.filter(id=id).delete()
+        invalidate_tags('gallery')
         return DeleteGalleryItem(ok=True)
 
 
+class BulkGalleryItemInput(graphene.InputObjectType):
+    title = graphene.String(required=True)
+    image = graphene.String()
+    image_file = Upload()
+    image_upload_id = graphene.ID()
+    description = graphene.String()
+
+
+class BulkGalleryItemResult(graphene.ObjectType):
+    index = graphene.Int()
+    success = graphene.Boolean()
+    message = graphene.String()
+    gallery = graphene.Field(GalleryType)
+
+
+class BulkCreateGalleryItems(graphene.Mutation):
+    class Arguments:
+        items = graphene.List(graphene.NonNull(BulkGalleryItemInput), required=True)
+
+    results = graphene.List(BulkGalleryItemResult)
+    created = graphene.Int()
+
+    def mutate(self, info, items):
+        user = info.context.user
+        if not user.is_authenticated or not user.is_admin:
+            raise Exception("Only admins can create gallery items")
+
+        results = [None] * len(items)
+        valid = []
+        with transaction.atomic():
+            for index, item in enumerate(items):
+                try:
+                    if item.get('image_upload_id'):
+                        image = chunked.consume(item['image_upload_id'], user)
+                    elif item.get('image_file') is not None:
+                        image = store_gallery_image(item['image_file'], item['image_file'].name)
+                    elif item.get('image'):
+                        image = item['image']
+                    else:
+                        raise ValueError("An image is required")
+                except (chunked.UploadError, ValueError) as e:
+                    results[index] = BulkGalleryItemResult(index=index, success=False, message=str(e))
+                    continue
+                valid.append((index, {**item, 'image': image}))
+
+            created = create_gallery_items([item for _, item in valid])
+
+        for (index, _), obj in zip(valid, created):
+            results[index] = BulkGalleryItemResult(index=index, success=True, message="Gallery item created", gallery=obj)
+        if created:
+            invalidate_tags('gallery')
+        return BulkCreateGalleryItems(results=results, created=len(created))
+
+
 class UpdateGalleryItem(graphene.Mutation):
     class Arguments:
         id = graphene.ID(required=True)
@@ -914,6 +1290,7 @@ class UpdateGalleryItem(graphene.Mutation):
         if image_file is not None:
             obj.image = image_file
         obj.save()
+        invalidate_tags('gallery')
         return UpdateGalleryItem(gallery=obj)
 
 
@@ -934,6 +1311,7 @@ class CreateInstructor(graphene.Mutation):
             raise Exception("Only admins can create instructors")
         dojo = DojoLocationModel.objects.get(id=dojo_location_id)
         obj = InstructorModel.objects.create(name=name, rank=rank, bio=bio or "", photo=photo_file or photo, dojo_location=dojo)
+        invalidate_tags('instructors')
         return CreateInstructor(instructor=obj)
 
 
@@ -962,6 +1340,7 @@ class UpdateInstructor(graphene.Mutation):
         if photo_file is not None:
             obj.photo = photo_file
         obj.save()
+        invalidate_tags('instructors')
         return UpdateInstructor(instructor=obj)
 
 
@@ -976,6 +1355,7 @@ class DeleteInstructor(graphene.Mutation):
         if not user.is_authenticated or not user.is_admin:
             raise Exception("Only admins can delete instructors")
         InstructorModel.objects.filter(id=id).delete()
+        invalidate_tags('instructors')
         return DeleteInstructor(ok=True)
 
 
@@ -999,6 +1379,7 @@ class CreateKarateAdventure(graphene.Mutation):
         if cover_image_file is not None:
             create_data["cover_image"] = cover_image_file
         obj = KarateAdventureModel.objects.create(**create_data)
+        invalidate_tags('karate_adventures')
         return CreateKarateAdventure(adventure=obj)
 
 
@@ -1026,6 +1407,7 @@ class UpdateKarateAdventure(graphene.Mutation):
         if cover_image_file is not None:
             obj.cover_image = cover_image_file
         obj.save()
+        invalidate_tags('karate_adventures')
         return UpdateKarateAdventure(adventure=obj)
 
 
@@ -1040,6 +1422,7 @@ class DeleteKarateAdventure(graphene.Mutation):
         if not user.is_authenticated or not user.is_admin:
             raise Exception("Only admins can delete adventures")
         KarateAdventureModel.objects.filter(id=id).delete()
+        invalidate_tags('karate_adventures')
         return DeleteKarateAdventure(ok=True)
 
 class Mutation(graphene.ObjectType):
@@ -1071,6 +1454,7 @@ class Mutation(graphene.ObjectType):
     update_event = UpdateEvent.Field()
     delete_event = DeleteEvent.Field()
     register_for_event = RegisterForEvent.Field()
+    cancel_registration = CancelRegistration.Field()
 
     # Contact mutations
     create_contact_message = CreateContactMessage.Field()
@@ -1080,6 +1464,7 @@ class Mutation(graphene.ObjectType):
     update_dojo_location = UpdateDojoLocation.Field()
     delete_dojo_location = DeleteDojoLocation.Field()
     create_gallery_item = CreateGalleryItem.Field()
+    bulk_create_gallery_items = BulkCreateGalleryItems.Field()
     update_gallery_item = UpdateGalleryItem.Field()
     delete_gallery_item = DeleteGalleryItem.Field()
     create_instructor = CreateInstructor.Field()
@@ -1089,6 +1474,10 @@ class Mutation(graphene.ObjectType):
     update_karate_adventure = UpdateKarateAdventure.Field()
     delete_karate_adventure = DeleteKarateAdventure.Field()
 
+    # Chunked upload mutations (admin only)
+    initiate_upload = InitiateUpload.Field()
+    finalize_upload = FinalizeUpload.Field()
+
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
 
@@ -54,14 +54,19 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'corsheaders',
     'graphene_django',
+    'core',
     'apps.news',
     'apps.events',
     'apps.contact',
     'apps.users',
     'apps.content',
+    'apps.jobs',
+    'apps.uploads',
+    'apps.search',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ConnectionTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -96,12 +101,57 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# The core.backends engines wrap Django's to time connection setup (see
+# core.database). Connections are kept for CONN_MAX_AGE seconds and checked
+# before reuse, instead of being opened and set up again for every request.
+# Under ASGI (GRAPHQL_ASYNC_VIEW), Django advises CONN_MAX_AGE = 0 and
+# relying on the backend's pooling instead.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts (see core.database)
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # A file rather than shared-cache memory, where concurrent tests
+        # fail with "table is locked" instead of waiting for busy_timeout
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    # Read-only connection to the same file for GraphQL queries, so they
+    # never queue behind writes (see core.database). On other backends,
+    # point this at a replica; reads there may lag behind mutations.
+    'replica': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': (BASE_DIR / 'db.sqlite3').as_uri() + '?mode=ro',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+# With several worker processes on PostgreSQL, use psycopg's connection
+# pool instead of persistent connections (requires psycopg[pool]; pooling
+# needs CONN_MAX_AGE = 0):
+#   'default': {
+#       'ENGINE': 'core.backends.postgresql',
+#       'NAME': 'hdki', 'USER': 'hdki', 'PASSWORD': '...', 'HOST': 'localhost',
+#       'CONN_MAX_AGE': 0,
+#       'OPTIONS': {'pool': {'min_size': 2, 'max_size': 10, 'timeout': 10}},
+#   },
+
+DATABASE_ROUTERS = ['core.database.ReadReplicaRouter']
+READ_REPLICA_DATABASE = 'replica'
+
+# Server-Timing header reporting connection setup time per request (see
+# core.middleware)
+DATABASE_CONNECTION_TIMING = {
+    'HEADER': DEBUG,
+}
+
+# New SQLite connections are tuned with core.database.DEFAULT_PRAGMAS; set
+# SQLITE_PRAGMAS to a dict of PRAGMAs to use instead
 
 
 # Password validation
@@ -163,6 +213,9 @@ JWT_AUTH = {
     'JWT_REFRESH_EXPIRATION_DELTA': timedelta(days=7),
     'JWT_ALGORITHM': 'HS256',
     'JWT_AUTH_HEADER_PREFIX': 'JWT',
+    # Verified tokens are cached in-process (see apps.users.token_cache)
+    'JWT_TOKEN_CACHE_SIZE': 1024,
+    'JWT_TOKEN_CACHE_MAX_AGE': timedelta(minutes=5),
 }
 
 # GraphQL settings
@@ -170,9 +223,67 @@ GRAPHENE = {
     'SCHEMA': 'core.schema.schema',
     'MIDDLEWARE': [
         'apps.users.middleware.JWTMiddleware',
+        'core.dataloaders.DataLoaderMiddleware',
     ],
 }
 
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Swap the "graphql" alias for FileBasedCache (or a shared backend) to keep
+# cached responses across processes and restarts, e.g.
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache' / 'graphql',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'graphql': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'graphql',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Response cache for public GraphQL queries (see core.response_cache)
+GRAPHQL_RESPONSE_CACHE = {
+    'CACHE_ALIAS': 'graphql',
+    'TIMEOUT': 300,
+}
+
+# Automatic persisted queries (see core.persisted_queries). In production,
+# point MANIFEST at the frontend's operation manifest and set
+# ALLOW_LIST_ONLY to reject any operation that is not in it.
+GRAPHQL_PERSISTED_QUERIES = {
+    'CACHE_ALIAS': 'graphql',
+    'ALLOW_LIST_ONLY': False,
+    'MANIFEST': None,
+}
+
+# Parsed and validated documents kept per process (see core.document_cache)
+GRAPHQL_DOCUMENT_CACHE_SIZE = 1000
+
+# Static cost limits for GraphQL operations (see core.cost). LIST_SIZES is
+# the expected cardinality of "Type.field" lists; FIELD_COSTS overrides the
+# default cost of 1 per object field.
+GRAPHQL_QUERY_COST = {
+    'MAX_COST': 5000,
+    'MAX_DEPTH': 8,
+    'DEFAULT_LIST_SIZE': 50,
+    'LIST_SIZES': {
+        'Query.users': 200,
+        'Query.contactMessages': 200,
+        'Query.galleryItems': 100,
+        'DojoLocationType.instructors': 10,
+    },
+    'FIELD_COSTS': {},
+}
+
+# Serve /graphql/ with AsyncGraphQLView. Enable when running under an ASGI
+# server (core.asgi); under WSGI the synchronous view is cheaper. It
+# shortens queries with several root fields on a slow database, not
+# throughput; compare both with `manage.py benchmark_graphql --latency 20`.
+GRAPHQL_ASYNC_VIEW = False
+
 # CSRF settings for GraphQL
 CSRF_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_HTTPONLY = False
@@ -196,5 +307,63 @@ CORS_ALLOWED_ORIGINS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Origin for media URLs returned by the API, e.g. a CDN in front of
+# MEDIA_URL ('https://cdn.example.com/media/'). Defaults to the request's host.
+MEDIA_BASE_URL = None
+
+# Media serving (see core.media). Content-addressed files are always cached
+# as immutable; MAX_AGE applies to everything else. Set ACCEL_REDIRECT to an
+# nginx "internal" location aliased to MEDIA_ROOT, or SENDFILE to True for
+# Apache/lighttpd, to let the web server stream files after Django checks
+# the request. With SIGNED_URLS, media is only served from URLs signed by
+# the API, which stay valid for SIGNATURE_MAX_AGE to twice that; keep
+# GRAPHQL_RESPONSE_CACHE's TIMEOUT below SIGNATURE_MAX_AGE.
+MEDIA_SERVE = {
+    'MAX_AGE': 3600,
+    'ACCEL_REDIRECT': None,
+    'SENDFILE': False,
+    'SIGNED_URLS': False,
+    'SIGNATURE_MAX_AGE': 3600,
+}
+
+# Uploads are stored by content hash (see core.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Responsive image derivatives written next to each upload (see core.images).
+# Formats Pillow cannot encode in this environment are skipped.
+IMAGE_DERIVATIVES = {
+    'WIDTHS': [320, 640, 1024, 1600],
+    'FORMATS': ['webp', 'avif'],
+    'QUALITY': 80,
+}
+
+# Background job queue (see apps.jobs). Run workers with
+# "python manage.py run_worker"; EAGER runs jobs in-process after commit,
+# which is handy in development when no worker is running.
+JOB_QUEUE = {
+    'PROCESSES': 2,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 10,  # seconds, doubled after every failed attempt
+    'LOCK_TIMEOUT': 600,  # seconds before a running job is assumed dead
+    'EAGER': False,
+}
+
+# Resumable chunked uploads (see apps.uploads). Chunks are PUT to
+# /uploads/<id>/ and streamed to MEDIA_ROOT/uploads/.
+CHUNKED_UPLOADS = {
+    'MAX_SIZE': 50 * 1024 * 1024,
+    'MAX_CHUNK_SIZE': 5 * 1024 * 1024,
+    'ALLOWED_CONTENT_TYPES': ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif'],
+    'EXPIRY': timedelta(hours=24),
+}
+
 # Static files
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -0,0 +1,96 @@
+"""
+Content-addressed media storage
+
+New uploads are stored under their SHA-256 digest
+(``cas/3f/a9c1....jpeg``) instead of their upload_to path, so the same image
+used by a news article, an event and the gallery is written to disk once.
+Because a digest name always refers to the same bytes, responses for these
+files can be cached forever (see ``is_immutable``).
+
+Names that are already content-addressed (e.g. derivatives written by
+core.images next to their original) are saved verbatim. Derivatives keep
+their name when they are regenerated with new settings, so they are not
+immutable. Reference counts
+and orphan cleanup live in apps.uploads.references.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+PREFIX = 'cas'
+
+
+def is_content_addressed(name):
+    """True if ``name`` lives under the content-addressed prefix"""
+    return name.startswith(PREFIX + '/')
+
+
+def is_immutable(name):
+    """True if ``name`` is a digest-named original, i.e. its bytes never change"""
+    stem = os.path.basename(os.path.splitext(name)[0])
+    return is_content_addressed(name) and '.' not in stem
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, **kwargs):
+        # Same name means same bytes, so overwriting is always harmless
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def content_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        return f'{PREFIX}/{digest[:2]}/{digest[2:]}{extension}'
+
+    def _save(self, name, content):
+        if is_content_addressed(name):
+            return super()._save(name, content)
+
+        # Hash while streaming to a temporary file, then move it into place
+        directory = self.path(PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            return self._store(temp_path, self.content_name(digest.hexdigest(), name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def adopt(self, path, name, link=False):
+        """
+        Move the local file at ``path`` into the store without copying it
+        and return its content-addressed name (``name`` supplies the
+        extension). With ``link`` it is hard-linked instead, leaving
+        ``path`` in place for the caller to remove.
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return self._store(path, self.content_name(digest.hexdigest(), name), link)
+
+    def _store(self, source_path, name, link=False):
+        target = self.path(name)
+        if os.path.exists(target):
+            # Already stored: keep the existing copy
+            if not link:
+                os.remove(source_path)
+            return name
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if link:
+            try:
+                os.link(source_path, target)
+            except FileExistsError:
+                return name
+        else:
+            os.replace(source_path, target)
+        # mkstemp() creates files readable by the owner only
+        os.chmod(target, self.file_permissions_mode or 0o644)
+        return name
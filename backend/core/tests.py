@@ -0,0 +1,346 @@
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.db import connection, connections
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from graphql import parse
+from PIL import Image
+
+from apps.contact.models import ContactMessage
+from apps.content.gallery_import import store_gallery_image
+from apps.content.models import DojoLocation, Gallery, Instructor
+from apps.events.models import Event, EventRegistration
+from apps.news.models import News
+from apps.users.models import User
+from apps.uploads.models import StoredFile
+from apps.users.tests import make_token
+from core.backends.sqlite3.base import DatabaseWrapper
+from core.cost import analyze
+from core.database import _file_configured, is_read_only
+from core.dataloaders import Loaders
+from core.images import process_image
+from core.media import serve_media
+from core.response_cache import get_cache
+from core.schema import schema
+
+
+def sqlite_wrapper(name, alias):
+    settings_dict = {**connections.settings['default'], 'NAME': name}
+    return DatabaseWrapper(settings_dict, alias=alias)
+
+
+class ReadOnlyConnectionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'db.sqlite3'
+        with sqlite3.connect(self.path) as db:
+            db.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        db.close()
+
+    def test_is_read_only(self):
+        self.assertTrue(is_read_only(sqlite_wrapper(self.path.as_uri() + '?mode=ro', 'replica_test')))
+        self.assertFalse(is_read_only(sqlite_wrapper(self.path.as_uri(), 'primary_test')))
+        self.assertFalse(is_read_only(sqlite_wrapper(str(self.path), 'primary_test')))
+
+    def test_read_only_connection_skips_file_pragmas(self):
+        # As if the primary had already configured its (other) file
+        _file_configured.set()
+        replica = sqlite_wrapper(self.path.as_uri() + '?mode=ro', 'replica_test')
+        self.addCleanup(replica.close)
+        with replica.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM item')
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertFalse(os.path.exists(f'{self.path}-wal'))
+
+
+class ServeMediaTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        for name in ('news/cover.txt', 'uploads/1234/staged.txt', 'cas/ab/cdef.jpeg', 'cas/ab/cdef.320w.webp'):
+            (self.root / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / name).write_text(name)
+        settings_override = override_settings(MEDIA_ROOT=str(self.root))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def serve(self, path):
+        response = serve_media(RequestFactory().get(f'/media/{path}'), path)
+        return b''.join(response.streaming_content)
+
+    def test_serves_public_files(self):
+        self.assertEqual(self.serve('news/cover.txt'), b'news/cover.txt')
+        self.assertEqual(self.serve('news/./cover.txt'), b'news/cover.txt')
+
+    def test_only_digest_named_originals_are_immutable(self):
+        # Derivatives keep their name when regenerated with new settings
+        for path, immutable in (
+            ('cas/ab/cdef.jpeg', True),
+            ('cas/ab/cdef.320w.webp', False),
+            ('news/cover.txt', False),
+        ):
+            with self.subTest(path=path):
+                response = serve_media(RequestFactory().get(f'/media/{path}'), path)
+                self.assertEqual('immutable' in response['Cache-Control'], immutable)
+
+    def test_private_files_cannot_be_reached_through_dot_segments(self):
+        for path in (
+            'uploads/1234/staged.txt',
+            './uploads/1234/staged.txt',
+            'news/../uploads/1234/staged.txt',
+            'news/..\\uploads/1234/staged.txt',
+            '../outside.txt',
+        ):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.serve(path)
+
+
+# Reads stay on the test transaction's connection instead of the replica
+@override_settings(READ_REPLICA_DATABASE=None)
+class DataLoaderTests(TestCase):
+    query = '{ dojoLocations { id name instructors { id name dojoLocation { id name } } } }'
+
+    def setUp(self):
+        get_cache().clear()
+
+    def add_locations(self, count):
+        for i in range(count):
+            location = DojoLocation.objects.create(name=f'Dojo {i}', address='Street 1', city='Zagreb', country='HR')
+            Instructor.objects.bulk_create(
+                Instructor(name=f'Sensei {i}.{j}', rank='3rd Dan', dojo_location=location) for j in range(3)
+            )
+
+    def load_instructors(self, keys):
+        loaders = Loaders()
+        return [loaders.instructors_by_dojo_location.load(key, keys) for key in keys]
+
+    def fetch_locations(self):
+        response = self.client.post('/graphql/', json.dumps({'query': self.query}), content_type='application/json')
+        return response.json()['data']['dojoLocations']
+
+    def test_loader_batches_all_sibling_locations(self):
+        self.add_locations(5)
+        keys = list(DojoLocation.objects.values_list('pk', flat=True))
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.load_instructors(keys)), 5)
+
+        self.add_locations(5)
+        keys = list(DojoLocation.objects.values_list('pk', flat=True))
+        with self.assertNumQueries(1):
+            instructors = self.load_instructors(keys)
+        self.assertEqual([len(group) for group in instructors], [3] * 10)
+
+    def test_query_count_does_not_grow_with_locations(self):
+        self.add_locations(5)
+        # One query for the locations, one for all of their instructors
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.fetch_locations()), 5)
+
+        get_cache().clear()
+        self.add_locations(5)
+        with self.assertNumQueries(2):
+            locations = self.fetch_locations()
+        self.assertEqual(len(locations), 10)
+        self.assertTrue(all(len(location['instructors']) == 3 for location in locations))
+
+
+# Reads stay on the test transaction's connection instead of the replica
+@override_settings(READ_REPLICA_DATABASE=None)
+class QueryPlanTests(TestCase):
+    """The list queries and their keyset pages read rows in index order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', is_admin=True)
+        for i in range(3):
+            News.objects.create(title=f'News {i}', content='', author=cls.admin)
+            event = Event.objects.create(title=f'Event {i}', description='', date=timezone.now(), location='Dojo')
+            EventRegistration.objects.create(event=event, user=cls.admin)
+            ContactMessage.objects.create(name='Visitor', email='visitor@example.com', message='Hello')
+            Gallery.objects.create(title=f'Photo {i}', image=f'gallery/{i}.jpg')
+
+    def setUp(self):
+        get_cache().clear()
+
+    def capture(self):
+        """
+        Collect (sql, params) of the queries run in the block. EXPLAIN needs
+        the parameters, as SQLite plans the literals of the interpolated SQL
+        that assertNumQueries records differently.
+        """
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+        return connection.execute_wrapper(record), statements
+
+    def graphql(self, query, variables=None):
+        wrapper, statements = self.capture()
+        with wrapper:
+            response = self.client.post(
+                '/graphql/', json.dumps({'query': query, 'variables': variables or {}}),
+                content_type='application/json', HTTP_AUTHORIZATION=f'JWT {make_token(self.admin)}',
+            )
+        result = response.json()
+        self.assertNotIn('errors', result)
+        return result['data'], statements
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[3] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, statements, table, index, search=False):
+        """Every query on ``table`` reads ``index``, without sorting; ``search`` requires a range seek"""
+        step = re.compile(f'{"SEARCH" if search else "(SCAN|SEARCH)"} {table} USING (COVERING )?INDEX {index}\\b')
+        plans = [
+            self.explain(sql, params) for sql, params in statements
+            if sql.startswith('SELECT') and f'FROM "{table}"' in sql
+        ]
+        self.assertTrue(plans, f'No query on {table}')
+        for plan in plans:
+            self.assertTrue(any(step.match(row) for row in plan), plan)
+            self.assertFalse(any('USE TEMP B-TREE' in row for row in plan), plan)
+
+    def assertPagesUseIndex(self, field, table, index):
+        query = 'query($after: String) { %s(first: 2, after: $after) { pageInfo { endCursor } edges { node { id } } } }'
+        data, statements = self.graphql(query % field)
+        self.assertUsesIndex(statements, table, index)
+        data, statements = self.graphql(query % field, {'after': data[field]['pageInfo']['endCursor']})
+        self.assertEqual(len(data[field]['edges']), 1)
+        self.assertUsesIndex(statements, table, index, search=True)
+
+    def test_news(self):
+        self.assertUsesIndex(self.graphql('{ news { id } }')[1], 'news_news', 'news_published_idx')
+        self.assertPagesUseIndex('newsConnection', 'news_news', 'news_published_idx')
+
+    def test_events(self):
+        self.assertUsesIndex(self.graphql('{ events { id } }')[1], 'events_event', 'event_published_idx')
+        self.assertPagesUseIndex('eventsConnection', 'events_event', 'event_published_idx')
+
+    def test_my_registrations(self):
+        statements = self.graphql('{ myRegistrations { id } }')[1]
+        self.assertUsesIndex(statements, 'events_eventregistration', 'registration_user_idx', search=True)
+
+    def test_contact_messages(self):
+        self.assertUsesIndex(self.graphql('{ contactMessages { id } }')[1], 'contact_contactmessage', 'contact_recent_idx')
+        self.assertPagesUseIndex('contactMessagesConnection', 'contact_contactmessage', 'contact_recent_idx')
+
+    def test_unread_contact_messages(self):
+        # The admin's is_read filter
+        wrapper, statements = self.capture()
+        with wrapper:
+            list(ContactMessage.objects.filter(is_read=False))
+        self.assertUsesIndex(statements, 'contact_contactmessage', 'contact_unread_idx')
+
+    def test_gallery(self):
+        self.assertUsesIndex(self.graphql('{ galleryItems { id } }')[1], 'content_gallery', 'gallery_recent_idx')
+        self.assertPagesUseIndex('galleryItemsConnection', 'content_gallery', 'gallery_recent_idx')
+
+
+class QueryCostTests(SimpleTestCase):
+    def cost(self, query, variables=None):
+        return analyze(schema.graphql_schema, parse(query), None, variables or {})['cost']
+
+    def test_page_size_multiplies_cost(self):
+        self.assertEqual(self.cost('{ newsConnection(first: 10) { edges { node { author { id } } } } }'), 1 + 10 * 3)
+
+    def test_negative_page_size_does_not_lower_cost(self):
+        expensive = '{ newsConnection(first: 10) { edges { node { author { id } } } } }'
+        padded = '{ a: newsConnection(first: -100000) { edges { node { author { id } } } } %s }' % expensive[1:-1]
+        self.assertEqual(self.cost(padded), 1 + self.cost(expensive))
+        self.assertEqual(
+            self.cost('query($n: Int) { newsConnection(last: $n) { edges { node { id } } } }', {'n': -5}), 1,
+        )
+
+
+# Reads stay on the test transaction's connection instead of the replica
+@override_settings(READ_REPLICA_DATABASE=None, MEDIA_BASE_URL=None)
+class ResponseCacheTests(TestCase):
+    query = '{ galleryItems { image } }'
+
+    def setUp(self):
+        get_cache().clear()
+        Gallery.objects.create(title='Photo', image='gallery/photo.jpg')
+
+    def image_url(self, **extra):
+        response = self.client.post(
+            '/graphql/', json.dumps({'query': self.query}), content_type='application/json', **extra,
+        )
+        return response.json()['data']['galleryItems'][0]['image']
+
+    def test_media_urls_follow_host_and_scheme(self):
+        self.assertTrue(self.image_url(HTTP_HOST='localhost').startswith('http://localhost/'))
+        self.assertTrue(self.image_url(HTTP_HOST='127.0.0.1').startswith('http://127.0.0.1/'))
+        self.assertTrue(self.image_url(HTTP_HOST='localhost', secure=True).startswith('https://localhost/'))
+
+
+def jpeg_with_exif(size=(40, 20), orientation=6):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = 'Camera maker'
+    # GPS IFD
+    exif[0x8825] = {1: 'S', 2: (1.0, 17.0, 0.0)}
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, 'JPEG', exif=exif)
+    buffer.seek(0)
+    return buffer
+
+
+class ImageMetadataTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = self.settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def assertStripped(self, fieldfile):
+        with fieldfile.storage.open(fieldfile.name, 'rb') as f:
+            image = Image.open(f)
+            self.assertEqual(dict(image.getexif()), {})
+            # The orientation is applied rather than lost
+            self.assertEqual(image.size, (20, 40))
+
+    def test_processing_replaces_original_with_metadata(self):
+        item = Gallery(title='Photo')
+        item.image.save('photo.jpg', jpeg_with_exif())
+        original = item.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_image(item, 'image')
+
+        item.refresh_from_db()
+        self.assertNotEqual(item.image.name, original)
+        self.assertStripped(item.image)
+        self.assertFalse(item.image.storage.exists(original))
+        self.assertEqual(StoredFile.objects.get(name=item.image.name).references, 1)
+        self.assertFalse(StoredFile.objects.filter(name=original).exists())
+
+    def test_processing_keeps_original_without_metadata(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20), 'blue').save(buffer, 'JPEG')
+        item = Gallery(title='Photo')
+        item.image.save('photo.jpg', buffer)
+        original = item.image.name
+
+        process_image(item, 'image')
+        item.refresh_from_db()
+        self.assertEqual(item.image.name, original)
+
+    def test_imported_images_are_stored_without_metadata(self):
+        name = store_gallery_image(jpeg_with_exif(), 'photo.jpg')
+        self.assertStripped(Gallery(image=name).image)
@@ -15,17 +15,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
-from graphene_file_upload.django import FileUploadGraphQLView
+from apps.uploads.views import upload_chunk
+from core.media import serve_media
+from core.views import AsyncGraphQLView, GraphQLView, graphql_stats
+
+graphql_view = AsyncGraphQLView if settings.GRAPHQL_ASYNC_VIEW else GraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('graphql/', csrf_exempt(FileUploadGraphQLView.as_view(graphiql=True))),
+    path('graphql/', csrf_exempt(graphql_view.as_view(graphiql=True))),
+    path('graphql/stats/', graphql_stats),
+    path('uploads/<uuid:upload_id>/', upload_chunk, name='upload-chunk'),
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,350 @@
+"""
+GraphQL view for the /graphql/ endpoint
+"""
+import json
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import HttpError
+from graphene_file_upload.django import FileUploadGraphQLView
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, parse, validate, validate_schema
+
+from apps.users.middleware import authenticate_request
+from core import cost, response_cache
+from core.async_schema import schema as async_schema
+from core.database import connection_stats, read_replica
+from core.document_cache import document_cache
+from core.media import get_url_builder
+from core.persisted_queries import PersistedQueryError, persisted_queries
+
+# Request attribute memoizing the current (query, CachedDocument)
+DOCUMENT_ATTR = '_graphql_document'
+
+# Request attribute holding the response's "extensions" entry
+EXTENSIONS_ATTR = '_graphql_extensions'
+
+
+class GraphQLView(FileUploadGraphQLView):
+    """
+    Multipart-aware GraphQL view that serves public queries from the
+    shared response cache (see core.response_cache), accepts automatic
+    persisted queries (see core.persisted_queries), reuses parsed and
+    validated documents (see core.document_cache) and rejects operations
+    over the cost budget (see core.cost).
+    """
+
+    def get_response(self, request, data, show_graphiql=False):
+        cache_key, cached = self.lookup_response_cache(request, data, show_graphiql)
+        if cached is not None:
+            return cached
+
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        return self.format_response(request, execution_result, id, show_graphiql, cache_key)
+
+    def format_response(self, request, execution_result, id, show_graphiql=False, cache_key=None):
+        """Render an ExecutionResult, storing it under ``cache_key`` if clean"""
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [
+                    self.format_error(e) for e in execution_result.errors
+                ]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        if cache_key is not None and status_code == 200 and result is not None and not execution_result.errors:
+            response_cache.set_response(cache_key, (result, status_code))
+        return result, status_code
+
+    def lookup_response_cache(self, request, data, show_graphiql=False):
+        """Return ``(cache_key, cached_response)``; either may be None"""
+        if show_graphiql or request.GET.get('pretty'):
+            return None, None
+        cache_key = self.get_cache_key(request, data)
+        if cache_key is None:
+            return None, None
+        return cache_key, response_cache.get_response(cache_key)
+
+    def get_cache_key(self, request, data):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        if not query:
+            return None
+        cached = self.get_document(request, query)
+        if cached.document is None or cached.errors:
+            return None
+
+        tags = response_cache.get_tags(cached.document, operation_name)
+        if tags is None:
+            return None
+        authenticate_request(request)
+        return response_cache.get_cache_key(
+            cached.normalized, variables, operation_name, response_cache.get_scope(request), tags,
+            get_url_builder(request).base_url,
+        )
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if extensions and isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except Exception:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+
+        query = persisted_queries.resolve(query, extensions)
+        return query, variables, operation_name, id
+
+    def json_encode(self, request, d, pretty=False):
+        extensions = getattr(request, EXTENSIONS_ATTR, None)
+        if extensions:
+            d = {**d, 'extensions': extensions}
+        return super().json_encode(request, d, pretty)
+
+    @staticmethod
+    def format_error(error):
+        if isinstance(error, PersistedQueryError):
+            return {'message': error.message, 'extensions': {'code': error.code}}
+        return FileUploadGraphQLView.format_error(error)
+
+    def parse_and_validate(self, query):
+        """Return ``(document, errors)`` for a query string"""
+        try:
+            document = parse(query)
+        except Exception as e:
+            return None, [e]
+
+        validation_errors = validate(
+            self.schema.graphql_schema,
+            document,
+            self.validation_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        return document, validation_errors
+
+    def get_document(self, request, query):
+        """Return the CachedDocument for ``query``, memoized on the request"""
+        memo = getattr(request, DOCUMENT_ATTR, None)
+        if memo is None or memo[0] != query:
+            memo = (query, document_cache.get(query, self.parse_and_validate))
+            setattr(request, DOCUMENT_ATTR, memo)
+        return memo[1]
+
+    def prepare_execution(self, request, query, variables, operation_name, show_graphiql=False):
+        """
+        Parse, validate and cost-check ``query``.
+
+        Returns ``(document, operation_ast, result)``; when ``document`` is
+        None, ``result`` is what to respond with instead of executing.
+        """
+        if not query:
+            if show_graphiql:
+                return None, None, None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return None, None, ExecutionResult(data=None, errors=schema_validation_errors)
+
+        cached = self.get_document(request, query)
+        document, errors = cached.document, cached.errors
+        if document is None:
+            return None, None, ExecutionResult(errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None, None, None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if errors:
+            return None, None, ExecutionResult(data=None, errors=errors)
+
+        analysis = cost.analyze(schema, document, operation_name, variables)
+        if analysis is not None:
+            setattr(request, EXTENSIONS_ATTR, {'cost': {
+                'requested': analysis['cost'],
+                'maximum': cost.COST_SETTINGS.get('MAX_COST'),
+                'depth': analysis['depth'],
+                'maximumDepth': cost.COST_SETTINGS.get('MAX_DEPTH'),
+            }})
+            cost_errors = cost.check_limits(analysis)
+            if cost_errors:
+                return None, None, ExecutionResult(data=None, errors=cost_errors)
+
+        return document, operation_ast, None
+
+    def get_execute_options(self, request, variables, operation_name):
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+        return execute_options
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        document, operation_ast, result = self.prepare_execution(
+            request, query, variables, operation_name, show_graphiql
+        )
+        if document is None:
+            return result
+
+        schema = self.schema.graphql_schema
+        try:
+            execute_options = self.get_execute_options(request, variables, operation_name)
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            if operation_ast is not None and operation_ast.operation == OperationType.QUERY:
+                with read_replica():
+                    return execute(schema, document, **execute_options)
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+class AsyncGraphQLView(GraphQLView):
+    """
+    Async variant of GraphQLView for ASGI deployments.
+
+    Query operations execute against core.async_schema, whose root
+    resolvers run concurrently in worker threads, so independent root
+    fields overlap and the event loop is free while they wait on the
+    database. Mutations, GraphiQL and batch requests fall back to the
+    synchronous code path in a thread. The benchmark_graphql command
+    compares it with GraphQLView.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        return await self.dispatch(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await self.dispatch(request, *args, **kwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.batch or (self.graphiql and self.can_display_graphiql(request, data)):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            result, status_code = await self.get_response_async(request, data)
+            return HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    async def get_response_async(self, request, data):
+        cache_key, cached = await sync_to_async(self.lookup_response_cache)(request, data)
+        if cached is not None:
+            return cached
+
+        query, variables, operation_name, id = await sync_to_async(self.get_graphql_params)(request, data)
+
+        document, operation_ast, result = self.prepare_execution(
+            request, query, variables, operation_name
+        )
+        if document is not None:
+            if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+                return await sync_to_async(self.get_response)(request, data)
+
+            try:
+                # Resolver threads inherit the context, and with it the routing
+                with read_replica():
+                    await sync_to_async(authenticate_request)(request)
+                    result = execute(
+                        async_schema.graphql_schema,
+                        document,
+                        **self.get_execute_options(request, variables, operation_name),
+                    )
+                    if isawaitable(result):
+                        result = await result
+            except Exception as e:
+                result = ExecutionResult(errors=[e])
+
+        return await sync_to_async(self.format_response)(request, result, id, False, cache_key)
+
+
+@staff_member_required
+def graphql_stats(request):
+    """Document cache and database connection counters for monitoring"""
+    return JsonResponse({
+        'document_cache': document_cache.info(),
+        'database_connections': connection_stats(),
+    })